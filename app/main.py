@@ -1,12 +1,64 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 import os
+import json
+import asyncio
+import itertools
+import math
+import time
+from typing import Any, Awaitable, Dict, List, Literal, Optional, Tuple, TypeVar
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from app.services.ai_service import AIService
 from app.services.file_service import FileService
+from app.services.cache_service import generation_cache
+from app.services.design_store import create_design_store
+from app.services.job_service import JobQueue, QueueFullError
+from app.services.artifact_cache import Artifact, artifact_cache
+from app.services.singleflight import SingleFlight
+from app.services.hedging import hedge_policy
+from app.services.incremental_renderer import IncrementalRenderer, rendered_pages
+from app.services.renderer import HTMLRenderer
+from app.services.stylesheet_cache import stylesheet_cache
+from app.services.ui_service import UIService
+from app.services.upstream_scheduler import UpstreamBusyError, upstream_scheduler
+from app.services.metrics_service import (
+    CLIENT_DISCONNECTS,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    render_metrics,
+    server_timing_header,
+    start_request_trace
+)
+
+T = TypeVar("T")
+
+# Store generated designs (backend configured through DESIGN_STORE)
+design_store = create_design_store()
+
+# Concurrent downloads of the same uncached design build its archive once
+artifact_flights = SingleFlight("artifact")
+
+# Background generation jobs, sized to the upstream rate limit
+job_queue = JobQueue(
+    design_store,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_queue=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+    max_retained=int(os.getenv("JOB_RETENTION", "1000")),
+    max_busy_wait=float(os.getenv("JOB_BUSY_TIMEOUT", "600"))
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    yield
+    await job_queue.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -14,11 +66,34 @@ app = FastAPI(
     description="API for generating UI designs from app ideas",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
-# Store generated designs in memory
-generated_designs = {}
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Count and time every request, and report its pipeline spans in a Server-Timing header
+    """
+    request_id = start_request_trace()
+    start = time.perf_counter()
+    status = 500
+    with HTTP_REQUESTS_IN_FLIGHT.track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            # Label by route template rather than raw path to keep cardinality bounded
+            route = request.scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS.labels(request.method, route_path, str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(request.method, route_path).observe(time.perf_counter() - start)
+
+    response.headers["X-Request-ID"] = request_id
+    server_timing = server_timing_header()
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+    return response
 
 # Mount static files
 static_path = Path(__file__).parent.parent / "static"
@@ -35,6 +110,22 @@ class UIGenerationRequest(BaseModel):
     tech_stack: str = "html-tailwind"
     style_preferences: dict = {}
 
+class RenderRequest(BaseModel):
+    """
+    Request model for rendering a UI document
+    """
+    ui_components: List[Dict[str, Any]] = []
+    layout: Dict[str, Any] = {}
+    style_preferences: Dict[str, Any] = {}
+
+class RenderPatchRequest(RenderRequest):
+    """
+    Request model for re-rendering a UI document against its previous render
+    """
+    page_id: Optional[str] = None
+    version: Optional[str] = None
+    format: Literal["patches", "html"] = "patches"
+
 class UIGenerationResponse(BaseModel):
     """
     Response model for UI generation
@@ -49,8 +140,34 @@ async def read_root(request: Request):
     """
     return templates.TemplateResponse("index.html", {"request": request})
 
+def _busy_response(e: UpstreamBusyError) -> HTTPException:
+    """503 telling the client when Claude is likely to have capacity again"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+async def _cancel_on_disconnect(http_request: Request, endpoint: str, awaitable: Awaitable[T]) -> T:
+    """
+    Await awaitable, cancelling it (and the Claude call behind it) if the client disconnects first
+    """
+    task = asyncio.ensure_future(awaitable)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        CLIENT_DISCONNECTS.labels(endpoint).inc()
+        # Nobody will read the response; 499 only shows up in metrics and logs
+        raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
+        disconnected.cancel()
+
+async def _wait_for_disconnect(http_request: Request) -> None:
+    # The body has already been read, so the next message is the disconnect
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
 @app.post("/api/generate", response_model=UIGenerationResponse)
-async def generate_ui(request: UIGenerationRequest) -> dict:
+async def generate_ui(request: UIGenerationRequest, http_request: Request) -> dict:
     """
     Generate UI based on prompt.
     
@@ -61,53 +178,368 @@ async def generate_ui(request: UIGenerationRequest) -> dict:
     
     Returns:
     - dict containing generated HTML and design ID
+    - 503 with Retry-After when Claude is saturated
     """
     try:
         # Generate UI using Claude
-        preview_html, generated_code = await AIService.analyze_app_idea_with_claude(request.prompt, request.tech_stack)
+        preview_html, generated_code = await _cancel_on_disconnect(
+            http_request,
+            "generate",
+            AIService.analyze_app_idea_with_claude(request.prompt, request.tech_stack)
+        )
         
         # Store the result with a unique ID
         design_id = FileService.generate_unique_id()
-        generated_designs[design_id] = {
-            'html': preview_html,
-            'code': generated_code,
-            'tech_stack': request.tech_stack
-        }
+        await run_in_threadpool(design_store.put, design_id, generated_code, request.tech_stack)
         
         return {"html": preview_html, "design_id": design_id}
+    except HTTPException:
+        raise
+    except UpstreamBusyError as e:
+        raise _busy_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/download/{design_id}")
-async def download_code(design_id: str):
+def _sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/generate/stream")
+async def generate_ui_stream(request: UIGenerationRequest) -> StreamingResponse:
     """
-    Download the generated UI code as a zip file
+    Generate UI based on prompt, streaming the generated code as server-sent events.
+    
+    Events:
+    - chunk: {"section": ..., "text": ...} cleaned code as soon as it is final; section is
+      "state" or "jsx" for React and "code" otherwise
+    - done: {"html": ..., "design_id": ...} once generation has finished
+    - error: {"detail": ...} if generation failed
+
+    Responds 503 with Retry-After instead of starting the stream when Claude is saturated.
     """
     try:
-        # Get the stored design
-        if design_id not in generated_designs:
-            raise HTTPException(status_code=404, detail="Design not found")
-        
-        design = generated_designs[design_id]
-        tech_stack = design['tech_stack']
-        
-        # Create appropriate files based on tech stack
-        if tech_stack == "react-tailwind":
-            # Extract React components and types
-            content = design['code']  # Use the generated code, not the preview HTML
-            zip_path, filename = FileService.create_react_project(content)
+        events = await AIService.stream_app_idea_with_claude(request.prompt, request.tech_stack)
+    except UpstreamBusyError as e:
+        raise _busy_response(e)
+
+    async def event_stream():
+        try:
+            async for event in events:
+                if event["type"] == "chunk":
+                    yield _sse_event("chunk", {"section": event["section"], "text": event["text"]})
+                    continue
+
+                # Store the result with a unique ID
+                design_id = FileService.generate_unique_id()
+                await run_in_threadpool(design_store.put, design_id, event["code"], request.tech_stack)
+                yield _sse_event("done", {"html": event["html"], "design_id": design_id})
+        except asyncio.CancelledError:
+            # The client went away; leaving the stream closes the Claude request
+            CLIENT_DISCONNECTS.labels("generate_stream").inc()
+            raise
+        except UpstreamBusyError as e:
+            yield _sse_event("error", {"detail": str(e), "retry_after": math.ceil(e.retry_after)})
+        except Exception as e:
+            logging.error(f"Error streaming UI: {str(e)}")
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: UIGenerationRequest) -> JSONResponse:
+    """
+    Queue a UI generation job and return its ID immediately.
+    
+    Poll GET /api/jobs/{job_id} or subscribe to GET /api/jobs/{job_id}/events for the result.
+    """
+    try:
+        job = job_queue.submit(request.prompt, request.tech_stack)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status},
+        headers={"Location": f"/api/jobs/{job.id}"}
+    )
+
+@app.get("/api/jobs/stats")
+async def job_stats() -> dict:
+    """
+    Queue depth and worker usage of the job queue
+    """
+    return job_queue.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """
+    Current status of a generation job, including the result once it has finished
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    """
+    Stream job status changes as server-sent events until the job finishes
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for snapshot in job.updates():
+            yield _sse_event("status", snapshot)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """
+    Prometheus metrics for the generation pipeline
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/api/upstream/stats")
+async def upstream_stats() -> dict:
+    """
+    Concurrency limit, queue depth and remaining rate budget for Claude calls
+    """
+    return upstream_scheduler.stats()
+
+@app.get("/api/hedging/stats")
+async def hedging_stats() -> dict:
+    """
+    Per-stack hedge delay, remaining hedge budget and how often hedges won
+    """
+    return hedge_policy.stats()
+
+@app.get("/api/cache/stats")
+async def cache_stats() -> dict:
+    """
+    Hit/miss counters for the generation cache
+    """
+    return generation_cache.stats()
+
+@app.get("/api/designs/stats")
+async def design_store_stats() -> dict:
+    """
+    Memory usage of the design store
+    """
+    return await run_in_threadpool(design_store.stats)
+
+@app.get("/api/preview/{design_id}", response_class=HTMLResponse)
+async def preview_design(design_id: str):
+    """
+    Rebuild the preview HTML for a stored design
+    """
+    design = await run_in_threadpool(design_store.get, design_id)
+    if design is None:
+        raise HTTPException(status_code=404, detail="Design not found")
+    return AIService.build_preview_html(design['code'], design['tech_stack'])
+
+@app.post("/api/render", response_class=HTMLResponse)
+async def render_document(request: RenderRequest) -> StreamingResponse:
+    """
+    Render a UI document to an HTML page, streamed as it is rendered.
+
+    The theme's CSS is linked from /api/styles/ rather than inlined, so it is
+    downloaded once per theme instead of once per page.
+    """
+    ui_data = {
+        "ui_components": request.ui_components,
+        "layout": request.layout,
+        "design_tokens": UIService.generate_design_tokens(request.style_preferences)
+    }
+    chunks = HTMLRenderer.iter_html(ui_data, "/api/styles/")
+    try:
+        # Everything that can fail the page fails before the head is yielded
+        head = await run_in_threadpool(next, chunks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(itertools.chain((head,), chunks), media_type="text/html")
+
+@app.post("/api/render/patch")
+async def render_patch(request: RenderPatchRequest) -> dict:
+    """
+    Re-render a UI document, rendering only the components changed since the last
+    render of the same page.
+
+    Send back the page_id and version of the previous response. With format "patches"
+    the response lists the DOM patches that turn the previous page into the new one
+    (see IncrementalRenderer); with "html" it holds the whole page. A new, unknown or
+    outdated page_id/version gets a full render, sent as a single
+    {"op": "document", "html"} patch.
+    """
+    ui_data = {
+        "ui_components": request.ui_components,
+        "layout": request.layout,
+        "design_tokens": UIService.generate_design_tokens(request.style_preferences)
+    }
+    page_id = request.page_id or FileService.generate_unique_id()
+    previous = rendered_pages.get(page_id, request.version) if request.version is not None else None
+    patches = None
+    rendered = None
+    try:
+        if previous is None:
+            page = await run_in_threadpool(IncrementalRenderer.render, ui_data, "/api/styles/")
         else:
-            # Create simple HTML file
-            zip_path, filename = FileService.create_zip_from_html(design['code'])
-        
-        # Return the zip file
-        return FileResponse(
-            path=zip_path,
-            filename=filename,
-            media_type='application/zip',
-            background=lambda: FileService.cleanup_file(zip_path)
+            page, patches, rendered = await run_in_threadpool(IncrementalRenderer.rerender, previous, ui_data)
+        html = await run_in_threadpool(lambda: page.html) if request.format == "html" or patches is None else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    response: Dict[str, Any] = {"page_id": page_id, "version": rendered_pages.put(page_id, page)}
+    if request.format == "html":
+        response["html"] = html
+    else:
+        response["patches"] = patches if patches is not None else [{"op": "document", "html": html}]
+    if rendered is not None:
+        response["rendered"] = rendered
+    return response
+
+@app.get("/api/render/stats")
+async def rendered_page_stats() -> dict:
+    """
+    Usage of the rendered page cache behind /api/render/patch
+    """
+    return rendered_pages.stats()
+
+@app.get("/api/styles/stats")
+async def stylesheet_stats() -> dict:
+    """
+    Hit/miss counters for the design-token stylesheet cache
+    """
+    return stylesheet_cache.stats()
+
+@app.get("/api/styles/{filename}")
+async def get_stylesheet(filename: str, request: Request) -> Response:
+    """
+    Serve a theme stylesheet by content hash.
+
+    The name changes whenever the content does, so responses may be cached forever.
+    """
+    stylesheet = stylesheet_cache.get(filename)
+    if stylesheet is None:
+        raise HTTPException(status_code=404, detail="Stylesheet not found")
+
+    headers = {"ETag": stylesheet.etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or stylesheet.etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=stylesheet.css, media_type="text/css", headers=headers)
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into inclusive (start, end) offsets.
+
+    Returns None when the header should be ignored (malformed or multi-range) and
+    raises HTTPException(416) when the range cannot be satisfied.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the final N bytes
+            start = size - int(last)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start < 0:
+        start = 0
+    if start >= size or end < 0:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+async def _get_design_artifact(design_id: str) -> Artifact:
+    """Return the cached download archive for a design, building it once on a miss"""
+    artifact = artifact_cache.get(design_id)
+    if artifact is not None:
+        return artifact
+
+    # SQLite reads can wait on a locked database, so keep them off the event loop
+    design = await run_in_threadpool(design_store.get, design_id)
+    if design is None:
+        raise HTTPException(status_code=404, detail="Design not found")
+
+    async def build() -> Artifact:
+        # Build the archive in memory, off the event loop
+        zip_bytes, filename = await run_in_threadpool(
+            FileService.create_design_archive, design_id, design['code'], design['tech_stack']
         )
+        artifact = Artifact.from_bytes(zip_bytes, filename)
+        artifact_cache.put(design_id, artifact)
+        return artifact
+
+    return await artifact_flights.do(design_id, build)
+
+@app.get("/api/artifacts/stats")
+async def artifact_stats() -> dict:
+    """
+    Usage of the download artifact cache
+    """
+    return artifact_cache.stats()
+
+@app.get("/api/download/{design_id}")
+async def download_code(design_id: str, request: Request):
+    """
+    Download the generated UI code as a zip file.
+    
+    Responses carry a strong ETag; If-None-Match returns 304 and a single
+    byte Range returns 206 so interrupted downloads can resume.
+    """
+    try:
+        artifact = await _get_design_artifact(design_id)
+        headers = {
+            "Content-Disposition": f'attachment; filename="{artifact.filename}"',
+            "ETag": artifact.etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or artifact.etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        size = len(artifact.content)
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == artifact.etag):
+            byte_range = _parse_range(range_header, size)
+            if byte_range is not None:
+                start, end = byte_range
+                return Response(
+                    content=artifact.content[start:end + 1],
+                    status_code=206,
+                    media_type='application/zip',
+                    headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+                )
+
+        # Return the zip file
+        return Response(content=artifact.content, media_type='application/zip', headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
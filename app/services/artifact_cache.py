@@ -0,0 +1,72 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, NamedTuple, Optional
+from app.services.metrics_service import CACHE_LOOKUPS
+
+class Artifact(NamedTuple):
+    content: bytes
+    filename: str
+    etag: str
+
+    @classmethod
+    def from_bytes(cls, content: bytes, filename: str) -> "Artifact":
+        """Wrap archive bytes with a strong, content-hash ETag"""
+        return cls(content, filename, f'"{hashlib.sha256(content).hexdigest()}"')
+
+class ArtifactCache:
+    """
+    Byte-budgeted LRU of built download archives, keyed by design ID.
+
+    Designs never change once generated, so an archive built once can be served
+    for every later download of the same design.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stored_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, design_id: str) -> Optional[Artifact]:
+        with self._lock:
+            artifact = self._entries.get(design_id)
+            if artifact is None:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("artifact", "miss").inc()
+                return None
+            self._entries.move_to_end(design_id)
+            self.hits += 1
+        CACHE_LOOKUPS.labels("artifact", "hit").inc()
+        return artifact
+
+    def put(self, design_id: str, artifact: Artifact) -> None:
+        if len(artifact.content) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(design_id, None)
+            if previous is not None:
+                self._stored_bytes -= len(previous.content)
+            self._entries[design_id] = artifact
+            self._stored_bytes += len(artifact.content)
+            while self._stored_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._stored_bytes -= len(evicted.content)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "stored_bytes": self._stored_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+artifact_cache = ArtifactCache(max_bytes=int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))))
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+from app.services.metrics_service import CACHE_LOOKUPS
+
+class GenerationCache:
+    """
+    Content-addressed cache for Claude generations.
+
+    Entries are keyed on a hash of every input that affects the model output and
+    live in a bounded in-memory LRU backed by an on-disk tier that survives restarts.
+    The disk tier is read and written in a worker thread, and every so often pruned
+    of expired entries and then of the oldest ones beyond max_disk_entries and
+    max_disk_bytes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 86400,
+        cache_dir: Optional[str] = None,
+        max_disk_entries: int = 10000,
+        max_disk_bytes: int = 256 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(prompt: str, tech_stack: str, model: str, system_prompt: str) -> str:
+        """Hash the generation inputs into a cache key"""
+        payload = json.dumps([prompt, tech_stack, model, system_prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached generation for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, text = entry
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    CACHE_LOOKUPS.labels("generation", "memory_hit").inc()
+                    return text
+                del self._entries[key]
+
+        entry = await asyncio.to_thread(self._read_disk, key) if self.cache_dir else None
+        if entry is not None:
+            created_at, text = entry
+            if now - created_at < self.ttl_seconds:
+                with self._lock:
+                    self._insert(key, created_at, text)
+                    self.disk_hits += 1
+                CACHE_LOOKUPS.labels("generation", "disk_hit").inc()
+                return text
+            await asyncio.to_thread(self._remove_disk, key)
+
+        with self._lock:
+            self.misses += 1
+        CACHE_LOOKUPS.labels("generation", "miss").inc()
+        return None
+
+    async def set(self, key: str, text: str) -> None:
+        """Store a generation in both tiers"""
+        created_at = time.time()
+        with self._lock:
+            self._insert(key, created_at, text)
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, key, created_at, text)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hits": hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": self.cache_dir is not None,
+                "max_disk_entries": self.max_disk_entries,
+                "max_disk_bytes": self.max_disk_bytes,
+                "disk_evictions": self.disk_evictions
+            }
+
+    def _insert(self, key: str, created_at: float, text: str) -> None:
+        self._entries[key] = (created_at, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[tuple[float, str]]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["created_at"], data["text"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Error reading generation cache entry {key}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, created_at: float, text: str) -> None:
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": created_at, "text": text}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.error(f"Error writing generation cache entry {key}: {str(e)}")
+
+        with self._lock:
+            self._disk_writes += 1
+            # Prune on the first write, which clears what earlier runs left, then every 100th
+            prune = self._disk_writes % 100 == 1
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Delete expired entries, then the oldest ones until the disk tier is within bounds"""
+        expires_before = time.time() - self.ttl_seconds
+        files = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for item in scan:
+                    if not item.name.endswith(".json"):
+                        continue
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+        except Exception as e:
+            logging.error(f"Error scanning generation cache: {str(e)}")
+            return
+
+        files.sort()
+        total_bytes = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if (
+                mtime >= expires_before
+                and len(files) - removed <= self.max_disk_entries
+                and total_bytes <= self.max_disk_bytes
+            ):
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.error(f"Error pruning generation cache entry {path}: {str(e)}")
+                continue
+            removed += 1
+            total_bytes -= size
+        with self._lock:
+            self.disk_evictions += removed
+
+    def _remove_disk(self, key: str) -> None:
+        try:
+            self._disk_path(key).unlink(missing_ok=True)
+        except Exception as e:
+            logging.error(f"Error removing generation cache entry {key}: {str(e)}")
+
+generation_cache = GenerationCache(
+    max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("GENERATION_CACHE_TTL", "86400")),
+    cache_dir=os.getenv("GENERATION_CACHE_DIR", str(Path(__file__).parent.parent.parent / ".cache" / "generations")) or None,
+    max_disk_entries=int(os.getenv("GENERATION_CACHE_DISK_MAX_ENTRIES", "10000")),
+    max_disk_bytes=int(os.getenv("GENERATION_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+)
@@ -0,0 +1,606 @@
+import re
+import textwrap
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+FENCE = "```"
+FENCE_LANGUAGES = ("jsx", "tsx", "html", "javascript")
+CODE_STARTERS = ('const ', 'let ', 'return ', 'function ', 'if ', 'for ', '{')
+
+# Tokens that matter when looking for the component's return: comments and string
+# literals (matched whole, so a "return" inside them is skipped) and the keyword itself.
+# Quoted strings stop at a newline so prose with apostrophes can't swallow the code after it.
+_JS_TOKEN = re.compile(
+    r"//[^\n]*"
+    r"|/\*.*?(?:\*/|\Z)"
+    r"|\"(?:[^\"\\\n]|\\.)*(?:\"|$)"
+    r"|'(?:[^'\\\n]|\\.)*(?:'|$)"
+    r"|`(?:[^`\\]|\\.)*(?:`|\Z)"
+    r"|\breturn\b",
+    re.DOTALL | re.MULTILINE
+)
+
+# _JS_TOKEN for a buffer that more text will follow: a string cut off after a lone
+# backslash also reaches the end, as the next text completes the escape
+_JS_PARTIAL_TOKEN = re.compile(
+    r"//[^\n]*"
+    r"|/\*.*?(?:\*/|\Z)"
+    r"|\"(?:[^\"\\\n]|\\.)*(?:\"|$|\\\Z)"
+    r"|'(?:[^'\\\n]|\\.)*(?:'|$|\\\Z)"
+    r"|`(?:[^`\\]|\\.)*(?:`|\\?\Z)"
+    r"|\breturn\b",
+    re.DOTALL | re.MULTILINE
+)
+
+# Tokens for splitting a module into top-level declarations. A declaration starting at
+# column 0 also resynchronises the bracket depth if JSX text (an apostrophe in "Don't",
+# say) made the scanner misread a string; an indented one only counts outside brackets.
+_DECLARATION_TOKEN = re.compile(
+    r"//[^\n]*"
+    r"|/\*.*?(?:\*/|\Z)"
+    r"|\"(?:[^\"\\\n]|\\.)*(?:\"|$)"
+    r"|'(?:[^'\\\n]|\\.)*(?:'|$)"
+    r"|`(?:[^`\\]|\\.)*(?:`|\Z)"
+    r"|[{}()\[\];]"
+    r"|^(?P<indent>[ \t]*)(?:export[ \t]+(?:default[ \t]+)?)?"
+    r"(?P<keyword>interface|type|enum|const|let|var|function|class|import|export|return)\b"
+    r"(?:[ \t]+(?P<name>\w+))?",
+    re.DOTALL | re.MULTILINE
+)
+OPENING_BRACKETS = "{(["
+CLOSING_BRACKETS = "})]"
+
+class Declaration(NamedTuple):
+    keyword: str
+    name: Optional[str]
+    text: str
+
+# Body and closing of each _JS_TOKEN that can be cut off by the end of a streamed
+# buffer. The body stops short of a trailing "*" or "\\", which the next text may
+# turn into a closing or an escape.
+_TOKEN_ENDS = {
+    "//": (re.compile(r"[^\n]*"), re.compile(r"(?=\n)")),
+    "/*": (re.compile(r"(?:[^*]|\*(?=[^/]))*"), re.compile(r"\*/")),
+    '"': (re.compile(r"(?:[^\"\\\n]|\\.)*", re.DOTALL), re.compile(r"\"|(?=\n)")),
+    "'": (re.compile(r"(?:[^'\\\n]|\\.)*", re.DOTALL), re.compile(r"'|(?=\n)")),
+    "`": (re.compile(r"(?:[^`\\]|\\.)*", re.DOTALL), re.compile(r"`"))
+}
+
+# Cleanup rewrites compiled once, in the order they are applied. Each is skipped
+# unless its literal text appears in the code, so most run as one substring check.
+_CLEANUPS = [
+    # Fix useState syntax
+    ("React", re.compile(r'React\.useState'), 'useState'),
+    ("React", re.compile(r'React:\s*"useState"'), 'useState'),
+    ("React", re.compile(r'React:\s*useState'), 'useState'),
+    # Fix string numbers in objects
+    ('"', re.compile(r':\s*"(\d+(?:\.\d+)?)"'), r': \1'),
+    # Fix string numbers with colons
+    ('"', re.compile(r'"(\d+):\s*(\d+)"'), r'\1.\2'),
+    # Remove any extra components
+    ("Component", re.compile(r'let \w+Component\s*=\s*\(\)\s*=>\s*{'), ''),
+    ("Component", re.compile(r'const \w+Component\s*=\s*\(\)\s*=>\s*{'), '')
+]
+
+# Line endings after which a cleanup pattern can continue onto the next line
+CLEANUP_CONTINUATIONS = (':', '=', '=>', '()', 'Component')
+
+def _apply_cleanups(code: str) -> str:
+    for literal, pattern, replacement in _CLEANUPS:
+        if literal in code:
+            code = pattern.sub(replacement, code)
+    return code
+
+def _finish_react_code(code: str) -> str:
+    """Parenthesise a bare return statement and terminate the code"""
+    # Fix return statement
+    if code.startswith('return'):
+        # Ensure return statement has parentheses
+        if not code.startswith('return ('):
+            code = 'return (' + code[len('return'):].lstrip()
+            if code.endswith(';'):
+                code = code[:-1] + ');'
+            else:
+                code += ')'
+
+    # Only add semicolon if needed
+    if code and not code.rstrip().endswith((';', '}', '>')):
+        code += ';'
+    return code
+
+def _wrap_bare_jsx(code: str) -> str:
+    """Cleaned code with no return statement is assumed to be all JSX"""
+    if not code.startswith('return'):
+        code = 'return (' + code + ')'
+    return code
+
+def _is_code_line(line: str) -> bool:
+    stripped = line.strip()
+    return stripped.startswith(CODE_STARTERS) or stripped.startswith(('<', '}')) or '>' in line
+
+class CodeExtractor:
+    """
+    Linear-time extraction and cleanup of the code in Claude's responses.
+
+    Each step scans its input once: fences are located with str.find rather than
+    splitting on every fence, the React return statement is found with a single
+    tokenizer pass that skips strings and comments, and the cleanup rewrites are
+    compiled at import and skipped when their literal text is absent.
+    """
+
+    @staticmethod
+    def extract_code(text: str) -> str:
+        """Return the body of the first fenced block, or the text itself if there is none"""
+        start = text.find(FENCE)
+        if start == -1:
+            return text
+
+        start += len(FENCE)
+        end = text.find(FENCE, start)
+        code = text[start:] if end == -1 else text[start:end]
+
+        # Drop the language tag line
+        if code.startswith(FENCE_LANGUAGES):
+            newline = code.find("\n")
+            code = "" if newline == -1 else code[newline + 1:]
+        return code
+
+    @staticmethod
+    def split_react_code(code: str) -> Optional[Tuple[str, str]]:
+        """
+        Split component code at its first return statement.
+
+        Returns (state_code, jsx_code) where jsx_code is everything after the
+        return keyword, or None if the code has no return. A "return" inside a
+        string, comment or longer identifier is not a split point, and a later
+        return (in a .map callback, say) stays part of the JSX.
+        """
+        index = CodeExtractor._find_return(code)
+        if index is None:
+            return None
+        return code[:index], code[index + len("return"):]
+
+    @staticmethod
+    def clean_react_code(code: str, strip_prose: bool = True) -> str:
+        """
+        Clean and fix common React code issues.
+
+        With strip_prose, anything before the first 'const' is dropped as explanatory
+        text; pass False for JSX, where a 'const' inside the markup is not a code start.
+        """
+        # Remove any explanatory text before actual code
+        if strip_prose:
+            code_start = code.find('const')
+            if code_start != -1:
+                code = code[code_start:]
+
+        # Drop blank lines and any prose before the first line that looks like code
+        lines = code.split('\n')
+        first = next((i for i, line in enumerate(lines) if line.strip() and _is_code_line(line)), len(lines))
+        code = '\n'.join([line.rstrip() for line in lines[first:] if line.strip()])
+
+        return _finish_react_code(_apply_cleanups(code).strip())
+
+    @staticmethod
+    def clean_react_preview(code: str) -> Dict[str, str]:
+        """Cleaned {"state": ..., "ui": ...} preview code for an extracted React component"""
+        # Split the generated code into state declarations and JSX
+        code_parts = CodeExtractor.split_react_code(code)
+        if code_parts is None:
+            return {"ui": _wrap_bare_jsx(CodeExtractor.clean_react_code(code.strip()))}
+        return {
+            "state": CodeExtractor.clean_react_code(code_parts[0].strip()),
+            "ui": CodeExtractor.clean_react_code('return ' + code_parts[1].strip(), strip_prose=False)
+        }
+
+    @staticmethod
+    def _find_return(code: str) -> Optional[int]:
+        for match in _JS_TOKEN.finditer(code):
+            if match.group() == "return":
+                return match.start()
+        return None
+
+    @staticmethod
+    def split_declarations(code: str) -> List[Declaration]:
+        """
+        Split TypeScript/JSX module code into its top-level declarations in one pass.
+
+        A declaration runs from its keyword to its last top-level ';' or closing
+        bracket, so prose between declarations is dropped. Brackets inside strings,
+        template literals and comments are ignored. Indented declarations, as in code
+        copied out of a component body, are dedented.
+        """
+        declarations = []
+        current = None
+        start = end = depth = 0
+
+        def close(next_start: int) -> None:
+            if current is not None:
+                text = code[start:end] if end > start else code[start:next_start].rstrip()
+                if current.group("indent"):
+                    text = textwrap.dedent(text)
+                declarations.append(Declaration(current.group("keyword"), current.group("name"), text))
+
+        for match in _DECLARATION_TOKEN.finditer(code):
+            token = match.group()
+            if match.group("keyword"):
+                if match.group("indent") and depth:
+                    # Nested inside the current declaration
+                    continue
+                close(match.start())
+                current = match
+                start = end = match.start()
+                depth = 0
+            elif token in OPENING_BRACKETS:
+                depth += 1
+            elif token in CLOSING_BRACKETS:
+                depth = max(depth - 1, 0)
+                if depth == 0:
+                    end = match.end()
+            elif token == ";" and depth == 0:
+                end = match.end()
+        close(len(code))
+        return declarations
+
+class _StrippedOutput:
+    """
+    Emits text incrementally as if the whole of it were stripped at the end.
+
+    Leading whitespace is dropped and trailing whitespace held back until more text
+    follows. With react, the React end-of-code fixes are applied as well: a bare
+    return is parenthesised as soon as it is seen, and the closing ')' or ';' is
+    emitted by finish().
+    """
+
+    def __init__(self, react: bool):
+        self.react = react
+        self.parts: List[str] = []
+        self._start = ""
+        self._started = False
+        self._fix_return = False
+        self._held = ""
+        self._last_char = ""
+
+    def feed(self, text: str) -> str:
+        if not self._started:
+            # Wait until the start of the code shows whether it is a bare return
+            self._start += text
+            text = self._start.lstrip()
+            if not text:
+                return ""
+            if self.react and len(text) < len('return') and 'return'.startswith(text):
+                return ""
+            if self.react and text.startswith('return'):
+                if not text[len('return'):].strip():
+                    return ""
+                self._fix_return = not text.startswith('return (')
+                if self._fix_return:
+                    text = 'return (' + text[len('return'):].lstrip()
+            self._started = True
+
+        text = self._held + text
+        emitted = text.rstrip()
+        # A final ';' is rewritten to ');' when the return is parenthesised
+        if self._fix_return and emitted.endswith(';'):
+            emitted = emitted[:-1]
+        self._held = text[len(emitted):]
+        if emitted:
+            self._last_char = emitted[-1]
+            self.parts.append(emitted)
+        return emitted
+
+    def finish(self) -> str:
+        if not self._started:
+            code = self._start.strip()
+            if self.react:
+                code = _finish_react_code(code)
+            self.parts.append(code)
+            return code
+        if not self.react:
+            return ""
+
+        ending = self._held.rstrip()
+        if self._fix_return:
+            ending = ');' if ending.endswith(';') else ending + ')'
+        last_char = ending[-1] if ending else self._last_char
+        if last_char not in (';', '}', '>'):
+            ending += ';'
+        if ending:
+            self.parts.append(ending)
+        return ending
+
+    @property
+    def result(self) -> str:
+        return ''.join(self.parts)
+
+class _IncrementalCleaner:
+    """
+    CodeExtractor.clean_react_code applied to a stream of text.
+
+    Complete lines are filtered and cleaned as they arrive. A line is held back only
+    while it could still change: while no 'const' has been seen (with strip_prose),
+    and when it ends where a cleanup pattern could continue onto the next line.
+    """
+
+    def __init__(self, strip_prose: bool):
+        self.output = _StrippedOutput(react=True)
+        self._partial: List[str] = []
+        self._before_const: List[str] = []
+        self._found_const = not strip_prose
+        self._in_code = False
+        self._held_lines: List[str] = []
+        self._emitted_group = False
+
+    def feed(self, text: str) -> str:
+        if '\n' not in text:
+            self._partial.append(text)
+            return ""
+        self._partial.append(text)
+        lines = ''.join(self._partial).split('\n')
+        self._partial = [lines.pop()]
+        return self._process(lines)
+
+    def finish(self) -> str:
+        cleaned = self._process([''.join(self._partial)])
+        if not self._found_const:
+            # There was no 'const' to strip prose up to
+            self._found_const = True
+            lines, self._before_const = self._before_const, []
+            cleaned += self._process(lines)
+        cleaned += self._flush(len(self._held_lines))
+        return cleaned + self.output.finish()
+
+    @property
+    def result(self) -> str:
+        return self.output.result
+
+    def _process(self, lines: List[str]) -> str:
+        if not self._found_const:
+            for i, line in enumerate(lines):
+                index = line.find('const')
+                if index != -1:
+                    self._found_const = True
+                    self._before_const = []
+                    lines = [line[index:]] + lines[i + 1:]
+                    break
+            else:
+                self._before_const.extend(lines)
+                return ""
+
+        if not self._in_code:
+            first = next((i for i, line in enumerate(lines) if line.strip() and _is_code_line(line)), None)
+            if first is None:
+                return ""
+            self._in_code = True
+            lines = lines[first:]
+
+        self._held_lines.extend([line.rstrip() for line in lines if line.strip()])
+        ready = len(self._held_lines)
+        while ready and self._held_lines[ready - 1].endswith(CLEANUP_CONTINUATIONS):
+            ready -= 1
+        return self._flush(ready)
+
+    def _flush(self, count: int) -> str:
+        if not count:
+            return ""
+        group = '\n'.join(self._held_lines[:count])
+        del self._held_lines[:count]
+        if self._emitted_group:
+            group = '\n' + group
+        self._emitted_group = True
+        return self.output.feed(_apply_cleanups(group))
+
+class StreamingCodeParser:
+    """
+    Incremental counterpart of CodeExtractor for streamed responses.
+
+    feed() takes text deltas as they arrive and returns (section, code) pairs for the
+    cleaned code that has become final: "code" for HTML stacks, "state" and "jsx"
+    for React. Once finish() has been called the results match CodeExtractor run on
+    the whole response, so splicing the preview is the only work left at stream end.
+    """
+
+    def __init__(self, react: bool):
+        self.react = react
+        self._fence_state = "before"
+        self._raw: List[str] = []
+        self._fence_probe = ""
+        self._language = ""
+        self._held_ticks = ""
+        self._code_parts: List[str] = []
+        self._finished = False
+
+        if react:
+            self._section = "state"
+            self._state = _IncrementalCleaner(strip_prose=True)
+            self._jsx: Optional[_IncrementalCleaner] = None
+            self._jsx_started = False
+            self._lex_parts: List[str] = []
+            self._lex_offset = 0
+            # Opening of the token cut off at the end of the buffer, and the text of it
+            # that has not been scanned yet
+            self._lex_pending = ""
+            self._lex_tail = ""
+        else:
+            self._html = _StrippedOutput(react=False)
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        return self._route(self._extract(text), final=False)
+
+    def finish(self) -> List[Tuple[str, str]]:
+        self._finished = True
+        return self._route(self._extract_rest(), final=True)
+
+    @property
+    def code(self) -> str:
+        """The code extracted from the response, as CodeExtractor.extract_code returns it"""
+        return ''.join(self._code_parts)
+
+    def preview_code(self) -> Dict[str, str]:
+        """
+        The cleaned code to splice into the preview once finish() has been called,
+        as CodeExtractor.clean_react_preview returns it for React
+        """
+        if not self.react:
+            return {"ui": self._html.result}
+        if self._jsx is None:
+            return {"ui": _wrap_bare_jsx(self._state.result)}
+        return {"state": self._state.result, "ui": self._jsx.result}
+
+    def _extract(self, text: str) -> str:
+        """Fence handling: returns the part of text that is inside the code block"""
+        if self._fence_state == "before":
+            self._raw.append(text)
+            probe = self._fence_probe + text
+            start = probe.find(FENCE)
+            if start == -1:
+                self._fence_probe = probe[-(len(FENCE) - 1):]
+                return ""
+            self._raw = []
+            self._fence_state = "language"
+            text = probe[start + len(FENCE):]
+
+        if self._fence_state == "language":
+            buffer = self._language + text
+            end = buffer.find(FENCE)
+            if end != -1:
+                self._fence_state = "done"
+                return self._emit_code(self._drop_language(buffer[:end]))
+            if buffer.startswith(FENCE_LANGUAGES):
+                newline = buffer.find("\n")
+                if newline == -1:
+                    self._language = buffer
+                    return ""
+                text = buffer[newline + 1:]
+            elif any(language.startswith(buffer) for language in FENCE_LANGUAGES):
+                self._language = buffer
+                return ""
+            else:
+                text = buffer
+            self._fence_state = "code"
+
+        if self._fence_state == "code":
+            buffer = self._held_ticks + text
+            end = buffer.find(FENCE)
+            if end != -1:
+                self._fence_state = "done"
+                self._held_ticks = ""
+                return self._emit_code(buffer[:end])
+            # Hold back backticks that may be the start of the closing fence
+            ticks = min(len(buffer) - len(buffer.rstrip('`')), len(FENCE) - 1)
+            self._held_ticks = buffer[len(buffer) - ticks:]
+            return self._emit_code(buffer[:len(buffer) - ticks])
+
+        return ""
+
+    def _extract_rest(self) -> str:
+        if self._fence_state == "before":
+            # No fence: the whole response is the code
+            text, self._raw = ''.join(self._raw), []
+            return self._emit_code(text)
+        if self._fence_state == "language":
+            return self._emit_code(self._drop_language(self._language))
+        if self._fence_state == "code":
+            return self._emit_code(self._held_ticks)
+        return ""
+
+    @staticmethod
+    def _drop_language(code: str) -> str:
+        if code.startswith(FENCE_LANGUAGES):
+            newline = code.find("\n")
+            return "" if newline == -1 else code[newline + 1:]
+        return code
+
+    def _emit_code(self, code: str) -> str:
+        if code:
+            self._code_parts.append(code)
+        return code
+
+    def _route(self, code: str, final: bool) -> List[Tuple[str, str]]:
+        if not self.react:
+            events = [("code", self._html.feed(code))]
+            if final:
+                events.append(("code", self._html.finish()))
+            return [event for event in events if event[1]]
+
+        events = []
+        if self._section == "state":
+            code = self._split(code, final, events)
+        if self._section == "jsx":
+            events.append(("jsx", self._feed_jsx(code)))
+        if final:
+            if self._section == "jsx":
+                if not self._jsx_started:
+                    self._jsx.feed('return ')
+                events.append(("jsx", self._jsx.finish()))
+            else:
+                events.append(("state", self._state.finish()))
+        return [event for event in events if event[1]]
+
+    def _split(self, code: str, final: bool, events: List[Tuple[str, str]]) -> str:
+        """
+        Find the first return with the same tokens as CodeExtractor.split_react_code.
+
+        Text is handed to the state cleaner once no later text can change how it
+        tokenizes; a token that reaches the end of the buffer (an unterminated string
+        or comment, or a possible longer identifier) waits for more text. Only the new
+        text of a waiting string or comment is scanned for its end, so a long one costs
+        linear time. Returns the text after the return once it has been found.
+        """
+        scan_from = self._lex_offset
+        if self._lex_pending and not final:
+            body, closing = _TOKEN_ENDS[self._lex_pending]
+            text = self._lex_tail + code
+            stop = body.match(text).end()
+            close = closing.match(text, stop)
+            if close is None:
+                self._lex_parts.append(text[:stop])
+                self._lex_tail = text[stop:]
+                return ""
+            self._lex_parts.append(text)
+            buffer = ''.join(self._lex_parts)
+            scan_from = len(buffer) - len(text) + close.end()
+        else:
+            self._lex_parts.append(self._lex_tail + code)
+            buffer = ''.join(self._lex_parts)
+        position = self._lex_offset
+        safe = scan_from
+        self._lex_pending = self._lex_tail = ""
+
+        for match in (_JS_TOKEN if final else _JS_PARTIAL_TOKEN).finditer(buffer, scan_from):
+            token = match.group()
+            if match.end() == len(buffer) and not final:
+                safe = match.start()
+                opening = token[:2] if token[:2] in _TOKEN_ENDS else token[:1]
+                self._lex_pending = opening if opening in _TOKEN_ENDS else ""
+                break
+            if token == "return":
+                events.append(("state", self._state.feed(buffer[position:match.start()]) + self._state.finish()))
+                self._lex_parts = []
+                self._section = "jsx"
+                self._jsx = _IncrementalCleaner(strip_prose=False)
+                return buffer[match.end():]
+            safe = match.end()
+        else:
+            # Keep the last few characters: they may be the start of a token
+            safe = len(buffer) if final else max(safe, len(buffer) - len("return"))
+
+        events.append(("state", self._state.feed(buffer[position:safe])))
+        # Keep one character before the resume point so \b sees it
+        context = max(safe - 1, 0)
+        stop = len(buffer)
+        if self._lex_pending:
+            stop = _TOKEN_ENDS[self._lex_pending][0].match(buffer, safe + len(self._lex_pending)).end()
+            self._lex_tail = buffer[stop:]
+        self._lex_parts = [buffer[context:stop]]
+        self._lex_offset = safe - context
+        return ""
+
+    def _feed_jsx(self, code: str) -> str:
+        # Mirrors 'return ' + jsx.strip()
+        if not self._jsx_started:
+            code = code.lstrip()
+            if not code:
+                return ""
+            self._jsx_started = True
+            code = 'return ' + code
+        return self._jsx.feed(code)
@@ -0,0 +1,202 @@
+import os
+import time
+import zlib
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+# Rough per-entry bookkeeping cost (key, tuple, dict slot) counted against the budget
+ENTRY_OVERHEAD_BYTES = 200
+
+class DesignStore(ABC):
+    """
+    Interface for generated design storage.
+
+    A design is stored as its generated code and tech stack only; the preview HTML
+    is rebuilt from the code on demand.
+    """
+
+    @abstractmethod
+    def put(self, design_id: str, code: str, tech_stack: str) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, design_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"code": ..., "tech_stack": ...} or None if the design is unknown"""
+
+    def __contains__(self, design_id: str) -> bool:
+        return self.get(design_id) is not None
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+class MemoryDesignStore(DesignStore):
+    """Byte-budgeted LRU of zlib-compressed designs held in process memory"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, compression_level: int = 6):
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._entries: "OrderedDict[str, tuple[bytes, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stored_bytes = 0
+        self._payload_bytes = 0
+        self._raw_bytes = 0
+        self.evictions = 0
+
+    def put(self, design_id: str, code: str, tech_stack: str) -> None:
+        raw = code.encode("utf-8")
+        payload = zlib.compress(raw, self.compression_level)
+        with self._lock:
+            if design_id in self._entries:
+                self._remove(design_id)
+            self._entries[design_id] = (payload, tech_stack, len(raw))
+            self._stored_bytes += self._entry_size(payload, tech_stack)
+            self._payload_bytes += len(payload)
+            self._raw_bytes += len(raw)
+            # Always keep the newest design, even if it alone exceeds the budget
+            while self._stored_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get(self, design_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(design_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(design_id)
+        payload, tech_stack, _ = entry
+        return {"code": zlib.decompress(payload).decode("utf-8"), "tech_stack": tech_stack}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "stored_bytes": self._stored_bytes,
+                "compressed_bytes": self._payload_bytes,
+                "raw_bytes": self._raw_bytes,
+                "max_bytes": self.max_bytes,
+                "compression_ratio": self._raw_bytes / self._payload_bytes if self._payload_bytes else 0.0,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, design_id: str) -> None:
+        payload, tech_stack, raw_size = self._entries.pop(design_id)
+        self._stored_bytes -= self._entry_size(payload, tech_stack)
+        self._payload_bytes -= len(payload)
+        self._raw_bytes -= raw_size
+
+    @staticmethod
+    def _entry_size(payload: bytes, tech_stack: str) -> int:
+        return len(payload) + len(tech_stack) + ENTRY_OVERHEAD_BYTES
+
+class SQLiteDesignStore(DesignStore):
+    """
+    Designs persisted in a SQLite database in WAL mode.
+
+    The database file is shared by every process that opens it, so designs created
+    by one uvicorn worker can be downloaded through any other.
+    """
+
+    def __init__(self, path: str, pool_size: int = 8, max_entries: int = 0, compression_level: int = 6):
+        self.path = path
+        self.max_entries = max_entries
+        self.compression_level = compression_level
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._puts = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS designs ("
+                "design_id TEXT PRIMARY KEY, "
+                "tech_stack TEXT NOT NULL, "
+                "code BLOB NOT NULL, "
+                "raw_size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS designs_created_at ON designs (created_at)")
+
+    def put(self, design_id: str, code: str, tech_stack: str) -> None:
+        raw = code.encode("utf-8")
+        payload = zlib.compress(raw, self.compression_level)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO designs (design_id, tech_stack, code, raw_size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (design_id, tech_stack, payload, len(raw), time.time())
+            )
+            self._puts += 1
+            # Trim the oldest designs every so often rather than on every write
+            if self.max_entries and self._puts % 100 == 0:
+                conn.execute(
+                    "DELETE FROM designs WHERE design_id IN ("
+                    "SELECT design_id FROM designs ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def get(self, design_id: str) -> Optional[Dict[str, Any]]:
+        with self._connection() as conn:
+            row = conn.execute("SELECT code, tech_stack FROM designs WHERE design_id = ?", (design_id,)).fetchone()
+        if row is None:
+            return None
+        return {"code": zlib.decompress(row[0]).decode("utf-8"), "tech_stack": row[1]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connection() as conn:
+            entries, compressed_bytes, raw_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(code)), 0), COALESCE(SUM(raw_size), 0) FROM designs"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "compressed_bytes": compressed_bytes,
+            "raw_bytes": raw_bytes,
+            "max_entries": self.max_entries,
+            "compression_ratio": raw_bytes / compressed_bytes if compressed_bytes else 0.0,
+            "database_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection, opening a new one if the pool is empty"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+def create_design_store() -> DesignStore:
+    """Create the design store configured through the environment"""
+    backend = os.getenv("DESIGN_STORE", "memory")
+    if backend == "memory":
+        return MemoryDesignStore(max_bytes=int(os.getenv("DESIGN_STORE_MAX_BYTES", str(64 * 1024 * 1024))))
+    if backend == "sqlite":
+        default_path = Path(__file__).parent.parent.parent / ".cache" / "designs.sqlite3"
+        return SQLiteDesignStore(
+            path=os.getenv("DESIGN_STORE_PATH", str(default_path)),
+            pool_size=int(os.getenv("DESIGN_STORE_POOL_SIZE", "8")),
+            max_entries=int(os.getenv("DESIGN_STORE_MAX_ENTRIES", "0"))
+        )
+    raise ValueError(f"Unknown design store backend: {backend}")
@@ -1,65 +1,12 @@
-import os
+import io
+import textwrap
 import zipfile
-import tempfile
-from pathlib import Path
 from typing import Optional
 import uuid
-import re
+from app.services.code_extractor import CodeExtractor
+from app.services.metrics_service import span
 
-class FileService:
-    @staticmethod
-    def generate_unique_id() -> str:
-        """Generate a unique ID for a design"""
-        return uuid.uuid4().hex[:8]
-
-    @staticmethod
-    def create_zip_from_html(html_content: str, filename: Optional[str] = None) -> tuple[str, str]:
-        """
-        Creates a zip file containing the HTML content and returns the file path
-        """
-        if not filename:
-            filename = f"ui_design_{uuid.uuid4().hex[:8]}"
-            
-        # Create a temporary directory
-        temp_dir = tempfile.mkdtemp()
-        zip_path = os.path.join(temp_dir, f"{filename}.zip")
-        
-        # Create HTML file
-        html_file_path = os.path.join(temp_dir, "index.html")
-        with open(html_file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-            
-        # Create zip file
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(html_file_path, "index.html")
-            
-        return zip_path, f"{filename}.zip"
-
-    @staticmethod
-    def create_react_project(content: str) -> tuple[str, str]:
-        """
-        Creates a zip file containing a React + TypeScript project structure
-        """
-        # Generate unique filename
-        filename = f"react_ui_{uuid.uuid4().hex[:8]}"
-        
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp()
-        project_dir = os.path.join(temp_dir, filename)
-        os.makedirs(project_dir)
-        
-        # Extract TypeScript interfaces, React components, and main App
-        interfaces_match = re.search(r'(interface.*?}\s*)+', content, re.DOTALL)
-        components_match = re.search(r'(const\s+\w+\s*=.*?}\);?\s*)+', content, re.DOTALL)
-        app_match = re.search(r'const\s+App\s*=.*?}\);?\s*', content, re.DOTALL)
-        
-        # Create project structure
-        os.makedirs(os.path.join(project_dir, 'src'))
-        os.makedirs(os.path.join(project_dir, 'src', 'components'))
-        os.makedirs(os.path.join(project_dir, 'src', 'types'))
-        
-        # Write package.json
-        package_json = '''{
+REACT_PACKAGE_JSON = '''{
   "name": "generated-ui",
   "version": "0.1.0",
   "private": true,
@@ -79,12 +26,8 @@ class FileService:
     "eject": "react-scripts eject"
   }
 }'''
-        
-        with open(os.path.join(project_dir, 'package.json'), 'w') as f:
-            f.write(package_json)
-        
-        # Write tsconfig.json
-        tsconfig_json = '''{
+
+REACT_TSCONFIG_JSON = '''{
   "compilerOptions": {
     "target": "es5",
     "lib": ["dom", "dom.iterable", "esnext"],
@@ -103,47 +46,16 @@ class FileService:
   },
   "include": ["src"]
 }'''
-        
-        with open(os.path.join(project_dir, 'tsconfig.json'), 'w') as f:
-            f.write(tsconfig_json)
-        
-        # Write tailwind.config.js
-        tailwind_config = '''module.exports = {
+
+REACT_TAILWIND_CONFIG = '''module.exports = {
   content: ["./src/**/*.{js,jsx,ts,tsx}"],
   theme: {
     extend: {},
   },
   plugins: [],
 }'''
-        
-        with open(os.path.join(project_dir, 'tailwind.config.js'), 'w') as f:
-            f.write(tailwind_config)
-        
-        # Write TypeScript interfaces
-        if interfaces_match:
-            with open(os.path.join(project_dir, 'src', 'types', 'interfaces.ts'), 'w') as f:
-                f.write(interfaces_match.group())
-        
-        # Write all components and scripts to their respective files
-        if components_match:
-            components = components_match.group()
-            with open(os.path.join(project_dir, 'src', 'components', 'Components.tsx'), 'w') as f:
-                f.write('''import React from 'react';
-import { } from '../types/interfaces';
-
-''' + components)
-
-        # Write App.tsx
-        if app_match:
-            with open(os.path.join(project_dir, 'src', 'App.tsx'), 'w') as f:
-                f.write('''import React from 'react';
-import { } from './types/interfaces';
-import { } from './components/Components';
-
-''' + app_match.group())
-
-        # Write index.tsx
-        index_tsx = '''import React from 'react';
+
+REACT_INDEX_TSX = '''import React from 'react';
 import ReactDOM from 'react-dom/client';
 import './index.css';
 import App from './App';
@@ -157,19 +69,11 @@ root.render(
   </React.StrictMode>
 );'''
 
-        with open(os.path.join(project_dir, 'src', 'index.tsx'), 'w') as f:
-            f.write(index_tsx)
-
-        # Write index.css with Tailwind imports
-        index_css = '''@tailwind base;
+REACT_INDEX_CSS = '''@tailwind base;
 @tailwind components;
 @tailwind utilities;'''
 
-        with open(os.path.join(project_dir, 'src', 'index.css'), 'w') as f:
-            f.write(index_css)
-
-        # Create README.md
-        readme = '''# Generated UI Project
+REACT_README = '''# Generated UI Project
 
 This is a React + TypeScript project generated with Tailwind CSS.
 
@@ -190,52 +94,142 @@ This is a React + TypeScript project generated with Tailwind CSS.
    npm run build
    ```'''
 
-        with open(os.path.join(project_dir, 'README.md'), 'w') as f:
-            f.write(readme)
+ZIP_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Top-level declaration keywords routed to src/types/interfaces.ts and src/components/Components.tsx
+TYPE_KEYWORDS = ("interface", "type", "enum")
+COMPONENT_KEYWORDS = ("const", "let", "var", "function", "class")
 
-        # Create zip file
-        zip_path = os.path.join(temp_dir, f"{filename}.zip")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(project_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, project_dir))
+# Wraps code that is a component body (state declarations, then a top-level return) as App
+REACT_APP_PREFIX = '''const { useState, useEffect } = React;
 
-        return zip_path, f"{filename}.zip"
+const App = () => {
+'''
+REACT_APP_SUFFIX = '''
+};
+
+export default App;'''
+
+# Constant files of every generated React project
+REACT_SKELETON_ENTRIES = [
+    ('package.json', REACT_PACKAGE_JSON),
+    ('tsconfig.json', REACT_TSCONFIG_JSON),
+    ('tailwind.config.js', REACT_TAILWIND_CONFIG),
+    ('README.md', REACT_README),
+    ('src/index.tsx', REACT_INDEX_TSX),
+    ('src/index.css', REACT_INDEX_CSS)
+]
+
+class FileService:
+    @staticmethod
+    def generate_unique_id() -> str:
+        """Generate a unique ID for a design"""
+        return uuid.uuid4().hex[:8]
 
     @staticmethod
-    def cleanup_file(file_path: str) -> None:
-        """Clean up a temporary file and its parent directory"""
-        try:
-            # Remove the file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            # Remove the parent directory if it's empty
-            parent_dir = os.path.dirname(file_path)
-            if os.path.exists(parent_dir) and not os.listdir(parent_dir):
-                os.rmdir(parent_dir)
-        except Exception as e:
-            print(f"Error cleaning up file {file_path}: {str(e)}")
+    def create_zip_from_html(html_content: str, filename: Optional[str] = None) -> tuple[bytes, str]:
+        """
+        Creates an in-memory zip archive containing the HTML content and returns its bytes
+        """
+        if not filename:
+            filename = f"ui_design_{uuid.uuid4().hex[:8]}"
+
+        zip_bytes = FileService._build_zip([("index.html", html_content)])
+        return zip_bytes, f"{filename}.zip"
+
+    @staticmethod
+    def create_react_project(content: str, filename: Optional[str] = None) -> tuple[bytes, str]:
+        """
+        Creates an in-memory zip archive containing a React + TypeScript project structure
+        """
+        if not filename:
+            filename = f"react_ui_{uuid.uuid4().hex[:8]}"
+        
+        # Split the code into TypeScript interfaces, React components, and main App
+        with span("react_split"):
+            interfaces, components, app = [], [], []
+            has_return = False
+            for declaration in CodeExtractor.split_declarations(content):
+                if declaration.keyword in TYPE_KEYWORDS:
+                    interfaces.append(declaration.text)
+                elif declaration.name == "App" or declaration.keyword == "export":
+                    app.append(declaration.text)
+                elif declaration.keyword in COMPONENT_KEYWORDS or declaration.keyword == "return":
+                    components.append(declaration.text)
+                    has_return = has_return or declaration.keyword == "return"
+
+            # The React stack's usual output is the body of one component: its state
+            # declarations and the JSX that uses them all belong in App
+            if has_return and not app:
+                app.append(REACT_APP_PREFIX + textwrap.indent('\n\n'.join(components), '  ') + REACT_APP_SUFFIX)
+                components = []
+
+        entries = []
+        # Modules written so far, relative to src/; only these may be imported, or tsc
+        # fails to resolve the import
+        modules = []
+        
+        # TypeScript interfaces
+        if interfaces:
+            entries.append(('src/types/interfaces.ts', '\n\n'.join(interfaces) + '\n'))
+            modules.append('types/interfaces')
+        
+        # All components and scripts
+        if components:
+            entries.append(('src/components/Components.tsx',
+                            FileService._react_imports(modules, '..') + '\n\n'.join(components) + '\n'))
+            modules.append('components/Components')
+
+        # App.tsx
+        if app:
+            entries.append(('src/App.tsx', FileService._react_imports(modules, '.') + '\n\n'.join(app) + '\n'))
+
+        return FileService._append_to_zip(REACT_SKELETON_ZIP, entries), f"{filename}.zip"
 
     @staticmethod
-    def cleanup_temp_files(file_path: str):
+    def create_design_archive(design_id: str, code: str, tech_stack: str) -> tuple[bytes, str]:
         """
-        Cleans up temporary files and directories
+        Creates the download archive for a stored design.
+
+        The archive is named after the design and built deterministically, so the same
+        design always produces the same bytes.
         """
-        try:
-            # Remove the zip file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-            # Remove the parent temp directory
-            parent_dir = os.path.dirname(file_path)
-            if os.path.exists(parent_dir):
-                for root, dirs, files in os.walk(parent_dir, topdown=False):
-                    for name in files:
-                        os.remove(os.path.join(root, name))
-                    for name in dirs:
-                        os.rmdir(os.path.join(root, name))
-                os.rmdir(parent_dir)
-        except Exception as e:
-            print(f"Error cleaning up temp files: {str(e)}")
+        if tech_stack == "react-tailwind":
+            return FileService.create_react_project(code, f"react_ui_{design_id}")
+        return FileService.create_zip_from_html(code, f"ui_design_{design_id}")
+
+    @staticmethod
+    def _react_imports(modules: list[str], src: str) -> str:
+        """Import header for a generated source file; src is the relative path to src/"""
+        lines = ["import React from 'react';"]
+        lines.extend(f"import {{ }} from '{src}/{module}';" for module in modules)
+        return '\n'.join(lines) + '\n\n'
+
+    @staticmethod
+    def _zip_info(path: str) -> zipfile.ZipInfo:
+        """Zip entry with a fixed timestamp so archives are byte-for-byte reproducible"""
+        info = zipfile.ZipInfo(path, date_time=ZIP_ENTRY_DATE_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        return info
+
+    @staticmethod
+    def _build_zip(entries: list[tuple[str, str]]) -> bytes:
+        """Compress (path, content) entries into a zip archive held in memory"""
+        buffer = io.BytesIO()
+        with span("zip_build"), zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for path, file_content in entries:
+                zipf.writestr(FileService._zip_info(path), file_content)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _append_to_zip(base_zip: bytes, entries: list[tuple[str, str]]) -> bytes:
+        """Append entries to a copy of an existing archive without recompressing its contents"""
+        buffer = io.BytesIO(base_zip)
+        with span("zip_build"), zipfile.ZipFile(buffer, 'a', zipfile.ZIP_DEFLATED) as zipf:
+            for path, file_content in entries:
+                zipf.writestr(FileService._zip_info(path), file_content)
+        return buffer.getvalue()
+
+# The skeleton is compressed once at import; each download only appends the generated sources
+REACT_SKELETON_ZIP = FileService._build_zip(REACT_SKELETON_ENTRIES)
@@ -0,0 +1,214 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from app.services.metrics_service import HEDGED_REQUESTS
+
+T = TypeVar("T")
+
+class HedgeBudget:
+    """Hedges a stack may send: every generation earns ratio of a hedge, saved up to burst"""
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.credit = min(burst, 1.0) if ratio > 0 else 0.0
+
+    def earn(self) -> None:
+        self.credit = min(self.burst, self.credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credit < 1:
+            return False
+        self.credit -= 1
+        return True
+
+class HedgeAttempt:
+    """
+    Progress of one request in a hedged generation.
+
+    The request calls sent() each time it is sent to Claude and first_token() when
+    its first token arrives.
+    """
+
+    def __init__(self, policy: "HedgePolicy", stack: str):
+        self._policy = policy
+        self._stack = stack
+        self._sent_at: Optional[float] = None
+        self.sent_event = asyncio.Event()
+        self.first_token_event = asyncio.Event()
+
+    def sent(self) -> None:
+        self._sent_at = time.perf_counter()
+        self.sent_event.set()
+
+    def first_token(self) -> None:
+        """Record the time to first token; also called for a cancelled loser, as a lower bound"""
+        if self.first_token_event.is_set():
+            return
+        self.first_token_event.set()
+        if self._sent_at is not None:
+            self._policy.observe_first_token(self._stack, time.perf_counter() - self._sent_at)
+
+class HedgePolicy:
+    """
+    Sends a second request for a Claude generation whose first token is late.
+
+    The hedge delay is a percentile of the recent times to first token for the
+    stack, measured from when the request left the upstream queue. Whichever request
+    finishes first wins and the other is cancelled. Each stack has a budget: every
+    generation earns a fraction of a hedge, so at most that fraction of generations
+    cost a second request over time.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        percentile: float = 0.95,
+        min_delay: float = 1.0,
+        default_delay: float = 10.0,
+        budget: float = 0.05,
+        stack_budgets: Optional[Dict[str, float]] = None,
+        burst: float = 5.0,
+        window: int = 200,
+        min_samples: int = 20
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.budget = budget
+        self.stack_budgets = stack_budgets or {}
+        self.burst = burst
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._budgets: Dict[str, HedgeBudget] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+
+    def observe_first_token(self, stack: str, seconds: float) -> None:
+        samples = self._samples.get(stack)
+        if samples is None:
+            samples = self._samples[stack] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def delay(self, stack: str) -> float:
+        """Seconds to wait for a first token before hedging"""
+        samples = self._samples.get(stack)
+        if samples is None or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))])
+
+    async def run(self, stack: str, attempt: Callable[[HedgeAttempt], Awaitable[T]]) -> T:
+        """
+        Run attempt(progress), hedging it with a second attempt if its first token is late.
+
+        A failed request does not fail the generation while the other is still running.
+        """
+        if not self.enabled:
+            return await attempt(HedgeAttempt(self, stack))
+
+        budget = self._budget(stack)
+        budget.earn()
+        primary_progress = HedgeAttempt(self, stack)
+        primary = asyncio.ensure_future(attempt(primary_progress))
+        roles = {primary: "primary"}
+        progress = {primary: primary_progress}
+        try:
+            if await self._is_late(primary, primary_progress, self.delay(stack)):
+                if budget.try_spend():
+                    self._record(stack, "sent")
+                    hedge_progress = HedgeAttempt(self, stack)
+                    hedge = asyncio.ensure_future(attempt(hedge_progress))
+                    roles[hedge] = "hedge"
+                    progress[hedge] = hedge_progress
+                else:
+                    self._record(stack, "over_budget")
+
+            pending = set(roles)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: roles[t] != "primary"):
+                    if task.exception() is None:
+                        if len(roles) > 1:
+                            self._record(stack, f"{roles[task]}_won")
+                        return task.result()
+                    if error is None or roles[task] == "primary":
+                        error = task.exception()
+            raise error
+        finally:
+            for task in roles:
+                if not task.done():
+                    # Without this, the slow requests hedging cuts short would never be sampled
+                    if progress[task].sent_event.is_set():
+                        progress[task].first_token()
+                    task.cancel()
+                    # The loser's error, if any, is of no interest
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        stacks = set(self._samples) | set(self._budgets)
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "stacks": {
+                stack: {
+                    "delay": round(self.delay(stack), 3),
+                    "samples": len(self._samples.get(stack, ())),
+                    "budget": self._budget_ratio(stack),
+                    "credit": round(self._budget(stack).credit, 2),
+                    **self._outcomes.get(stack, {})
+                }
+                for stack in sorted(stacks)
+            }
+        }
+
+    async def _is_late(self, task: asyncio.Future, progress: HedgeAttempt, delay: float) -> bool:
+        """Whether task is still waiting for its first token delay seconds after it was sent"""
+        sent = asyncio.ensure_future(progress.sent_event.wait())
+        first_token = asyncio.ensure_future(progress.first_token_event.wait())
+        try:
+            # Time spent queueing for the upstream doesn't count; a hedge would queue too
+            await asyncio.wait({task, sent}, return_when=asyncio.FIRST_COMPLETED)
+            if task.done():
+                return False
+            done, _ = await asyncio.wait({task, first_token}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            return not done
+        finally:
+            sent.cancel()
+            first_token.cancel()
+
+    def _budget_ratio(self, stack: str) -> float:
+        return self.stack_budgets.get(stack, self.budget)
+
+    def _budget(self, stack: str) -> HedgeBudget:
+        budget = self._budgets.get(stack)
+        if budget is None:
+            budget = self._budgets[stack] = HedgeBudget(self._budget_ratio(stack), self.burst)
+        return budget
+
+    def _record(self, stack: str, outcome: str) -> None:
+        outcomes = self._outcomes.setdefault(stack, {})
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        HEDGED_REQUESTS.labels(stack, outcome).inc()
+
+def _parse_budgets(value: str) -> Dict[str, float]:
+    """Parse "react-tailwind=0.1,html-tailwind=0.02" into per-stack hedge budgets"""
+    budgets = {}
+    for item in value.split(","):
+        stack, _, ratio = item.partition("=")
+        if stack.strip() and ratio.strip():
+            budgets[stack.strip()] = float(ratio)
+    return budgets
+
+hedge_policy = HedgePolicy(
+    enabled=os.getenv("CLAUDE_HEDGING", "0").lower() in ("1", "true", "yes"),
+    percentile=float(os.getenv("CLAUDE_HEDGE_PERCENTILE", "95")) / 100,
+    min_delay=float(os.getenv("CLAUDE_HEDGE_MIN_DELAY", "1")),
+    default_delay=float(os.getenv("CLAUDE_HEDGE_DEFAULT_DELAY", "10")),
+    budget=float(os.getenv("CLAUDE_HEDGE_BUDGET", "0.05")),
+    stack_budgets=_parse_budgets(os.getenv("CLAUDE_HEDGE_BUDGETS", ""))
+)
@@ -0,0 +1,389 @@
+import os
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Tuple
+from app.services.metrics_service import CACHE_LOOKUPS
+from app.services.renderer import (
+    HTMLRenderer,
+    LAYOUT_TAIL,
+    MEMO_MAX_CHILDREN,
+    PAGE_TAIL,
+    _children,
+    _container_attributes,
+    _container_close,
+    _container_open,
+    _is_container
+)
+from app.services.stylesheet_cache import Stylesheet
+
+logger = logging.getLogger(__name__)
+
+# Cost of keeping one component on top of its HTML: its dicts in ui_data as parsed
+# from JSON, the node tuple and a container's attributes (measured at 800-900 bytes)
+NODE_OVERHEAD_BYTES = 900
+
+class RenderedNode(NamedTuple):
+    """
+    A rendered component. html is its HTML, or for a container only its opening tag;
+    the rest is joined from its children on demand, so no subtree's HTML is held
+    twice. html is empty when the component failed to render and has no element.
+    """
+    component: Any
+    html: str
+    # Estimated bytes held for the component and its subtree
+    size: int
+    # Containers only: the attributes of their element and their rendered children
+    attributes: Optional[Dict[str, str]] = None
+    children: Tuple["RenderedNode", ...] = ()
+
+class RenderedPage(NamedTuple):
+    """
+    A page as rendered by IncrementalRenderer, with the fragments it was built from.
+
+    It keeps ui_data to diff against, so ui_data must not be modified afterwards;
+    re-render a changed copy instead.
+    """
+    ui_data: Dict[str, Any]
+    stylesheet_base: Optional[str]
+    stylesheet: Stylesheet
+    layout_style: str
+    nodes: Tuple[RenderedNode, ...]
+
+    @property
+    def html(self) -> str:
+        """The page, identical to HTMLRenderer.generate_html(ui_data, stylesheet_base)"""
+        out = HTMLRenderer._head(self.stylesheet, self.stylesheet_base, self.layout_style)
+        _write_html(self.nodes, out)
+        out.append(LAYOUT_TAIL + PAGE_TAIL)
+        return "".join(out)
+
+    @property
+    def size(self) -> int:
+        """Estimated bytes held by the page, ui_data included"""
+        return NODE_OVERHEAD_BYTES + len(self.layout_style) + sum(node.size for node in self.nodes)
+
+class PageUpdate(NamedTuple):
+    page: RenderedPage
+    # DOM patch operations turning the previous page into this one, applied in order
+    patches: List[Dict[str, Any]]
+    # Components rendered for this update; unchanged ones are reused
+    rendered: int
+
+def _unchanged(previous: Any, component: Any) -> bool:
+    if previous is component:
+        return True
+    try:
+        return previous == component
+    except RecursionError:
+        # Too deep to compare in one go; the diff walks it level by level instead
+        return False
+
+def _leaf_node(component: Any, html: str) -> RenderedNode:
+    return RenderedNode(component, html, len(html) + NODE_OVERHEAD_BYTES)
+
+def _container_node(component: Dict[str, Any], attributes: Dict[str, str], children: Tuple[RenderedNode, ...]) -> RenderedNode:
+    html = _container_open(component["type"], attributes)
+    size = len(html) + NODE_OVERHEAD_BYTES + sum(child.size for child in children)
+    return RenderedNode(component, html, size, attributes, children)
+
+def _write_html(nodes: Tuple[RenderedNode, ...], out: List[str]) -> None:
+    """Append the HTML of nodes to out, walking nested containers on an explicit stack"""
+    stack: List[Any] = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            out.append(node)
+            continue
+        out.append(node.html)
+        if node.attributes is not None:
+            stack.append(_container_close(node.component["type"]))
+            stack.extend(reversed(node.children))
+
+def _node_html(node: RenderedNode) -> str:
+    out: List[str] = []
+    _write_html((node,), out)
+    return "".join(out)
+
+def _run(task: Generator) -> Any:
+    """
+    Run a recursive generator task on an explicit stack.
+
+    A task yields a sub-task to call it and receives its return value, so trees of any
+    depth are walked without touching the recursion limit.
+    """
+    stack = [task]
+    value = None
+    while True:
+        try:
+            subtask = stack[-1].send(value)
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return e.value
+            value = e.value
+        else:
+            stack.append(subtask)
+            value = None
+
+class _Update:
+    """State of one render or re-render: the patches so far and repeated subtrees seen"""
+
+    def __init__(self):
+        self.patches: List[Dict[str, Any]] = []
+        self.rendered = 0
+        self._reusable: Dict[str, RenderedNode] = {}
+
+    def leaf(self, component: Any) -> RenderedNode:
+        try:
+            html = HTMLRenderer._render_component(component)
+        except Exception as e:
+            logger.warning(f"Skipping component: {str(e)}")
+            return _leaf_node(component, "")
+        self.rendered += 1
+        return _leaf_node(component, html)
+
+    def build(self, component: Any) -> Generator[Any, Any, RenderedNode]:
+        """Render a component and its children from scratch"""
+        if not _is_container(component):
+            return self.leaf(component)
+
+        children = _children(component)
+        # Repeated containers of leaves are built once, as in SubtreeRenderer
+        fingerprint = None
+        if len(children) <= MEMO_MAX_CHILDREN and not any(map(_is_container, children)):
+            fingerprint = repr(component)
+            node = self._reusable.get(fingerprint)
+            if node is not None:
+                return node
+
+        try:
+            attributes = _container_attributes(component["type"], component.get("props", {}))
+        except Exception as e:
+            logger.warning(f"Skipping component: Failed to render component: {str(e)}")
+            node = _leaf_node(component, "")
+        else:
+            self.rendered += 1
+            nodes = []
+            for child in children:
+                nodes.append((yield self.build(child)) if _is_container(child) else self.leaf(child))
+            node = _container_node(component, attributes, tuple(nodes))
+        if fingerprint is not None:
+            self._reusable[fingerprint] = node
+        return node
+
+    def diff_children(
+        self,
+        previous: Tuple[RenderedNode, ...],
+        components: List[Any],
+        path: List[int]
+    ) -> Generator[Any, Any, Tuple[RenderedNode, ...]]:
+        """Re-render the children of the element at path, patching only what changed"""
+        # Unchanged runs at either end are kept as they are. Comparing a subtree walks
+        # it, so the pairs found to differ are remembered rather than compared again
+        start = 0
+        end_previous, end = len(previous), len(components)
+        while start < end_previous and start < end and _unchanged(previous[start].component, components[start]):
+            start += 1
+        changed = {0} if start < end_previous and start < end else set()
+        while end_previous > start and end > start:
+            if end_previous - 1 == start and end - 1 == start and changed:
+                break
+            if not _unchanged(previous[end_previous - 1].component, components[end - 1]):
+                if end_previous == end:
+                    changed.add(end - 1 - start)
+                break
+            end_previous -= 1
+            end -= 1
+
+        nodes = list(previous[:start])
+        # Index among the element's children; failed components have no element
+        index = sum(1 for node in nodes if node.html)
+        paired = min(end_previous, end) - start
+        for offset in range(paired):
+            node = yield self.diff(previous[start + offset], components[start + offset], path, index, offset in changed)
+            nodes.append(node)
+            if node.html:
+                index += 1
+        for node in previous[start + paired:end_previous]:
+            if node.html:
+                self.patches.append({"op": "remove", "path": path + [index]})
+        for component in components[start + paired:end]:
+            node = yield self.build(component)
+            nodes.append(node)
+            if node.html:
+                self.patches.append({"op": "insert", "path": path + [index], "html": _node_html(node)})
+                index += 1
+        nodes.extend(previous[end_previous:])
+        return tuple(nodes)
+
+    def diff(
+        self,
+        previous: RenderedNode,
+        component: Any,
+        path: List[int],
+        index: int,
+        changed: bool = False
+    ) -> Generator[Any, Any, RenderedNode]:
+        """Re-render a component that took the place of previous at index"""
+        if not changed and _unchanged(previous.component, component):
+            return previous
+
+        element = path + [index]
+        # A container that keeps its type keeps its element: patch its attributes and
+        # diff its children rather than rebuilding the subtree
+        if previous.attributes is not None and _is_container(component) and component["type"] == previous.component["type"]:
+            props = component.get("props", {})
+            try:
+                if _unchanged(previous.component.get("props", {}), props):
+                    attributes = previous.attributes
+                else:
+                    attributes = _container_attributes(component["type"], props)
+            except Exception as e:
+                logger.warning(f"Skipping component: Failed to render component: {str(e)}")
+                self.patches.append({"op": "remove", "path": element})
+                return _leaf_node(component, "")
+
+            changed = {
+                name: attributes.get(name)
+                for name in ("id", "class", "style")
+                if attributes.get(name) != previous.attributes.get(name)
+            }
+            if changed:
+                self.patches.append({"op": "set_attributes", "path": element, "attributes": changed})
+            children = yield self.diff_children(previous.children, _children(component), element)
+            return _container_node(component, attributes, children)
+
+        node = yield self.build(component)
+        if previous.html and node.html:
+            # A rebuilt container always replaces the element; equal leaves need no patch
+            if node.attributes is not None or previous.attributes is not None or node.html != previous.html:
+                self.patches.append({"op": "replace", "path": element, "html": _node_html(node)})
+        elif node.html:
+            self.patches.append({"op": "insert", "path": element, "html": _node_html(node)})
+        elif previous.html:
+            self.patches.append({"op": "remove", "path": element})
+        return node
+
+class IncrementalRenderer:
+    """
+    Renders UI documents so that later versions re-render only what changed.
+
+    The rendered page keeps the HTML of every component. Re-rendering diffs the new
+    component tree against the previous one: unchanged subtrees are compared but not
+    rendered, and the result is both the new page, assembled from the kept fragments,
+    and the DOM patches that turn the previous page into it.
+
+    Patches address elements by path, the child indices from the layout container
+    (path [] is the container itself), and apply in order:
+    - {"op": "replace", "path", "html"}: replace the element with html
+    - {"op": "insert", "path", "html"}: insert html before the element at path, or
+      append it when the last index is past the end
+    - {"op": "remove", "path"}: remove the element
+    - {"op": "set_attributes", "path", "attributes"}: set attributes, removing those
+      that are null
+    - {"op": "stylesheet", "href"} or {"op": "stylesheet", "css"}: swap the theme
+      stylesheet, linked or inlined as rendered
+    """
+
+    @staticmethod
+    def render(ui_data: Dict[str, Any], stylesheet_base: Optional[str] = None) -> RenderedPage:
+        """Render a page from scratch, keeping its fragments"""
+        return IncrementalRenderer._update(None, ui_data, stylesheet_base).page
+
+    @staticmethod
+    def rerender(previous: RenderedPage, ui_data: Dict[str, Any]) -> PageUpdate:
+        """Render ui_data, reusing the fragments of components unchanged since previous"""
+        return IncrementalRenderer._update(previous, ui_data, previous.stylesheet_base)
+
+    @staticmethod
+    def _update(previous: Optional[RenderedPage], ui_data: Dict[str, Any], stylesheet_base: Optional[str]) -> PageUpdate:
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Layout: {json.dumps(ui_data.get('layout', {}), indent=2)}")
+
+            stylesheet = HTMLRenderer._stylesheet(ui_data.get("design_tokens", {}))
+            layout_style = HTMLRenderer._layout_style(ui_data.get("layout", {}))
+            components = ui_data.get("ui_components", [])
+            update = _Update()
+            if previous is None:
+                nodes = tuple(_run(update.build(component)) for component in components)
+            else:
+                if stylesheet.digest != previous.stylesheet.digest:
+                    if stylesheet_base is None:
+                        update.patches.append({"op": "stylesheet", "css": stylesheet.css})
+                    else:
+                        update.patches.append({"op": "stylesheet", "href": f"{stylesheet_base}{stylesheet.filename}"})
+                if layout_style != previous.layout_style:
+                    update.patches.append({"op": "set_attributes", "path": [], "attributes": {"style": layout_style}})
+                nodes = _run(update.diff_children(previous.nodes, components, []))
+
+            page = RenderedPage(ui_data, stylesheet_base, stylesheet, layout_style, nodes)
+            return PageUpdate(page, update.patches, update.rendered)
+
+        except Exception as e:
+            logger.error(f"Error generating HTML: {str(e)}")
+            raise Exception(f"Failed to generate HTML: {str(e)}")
+
+class RenderedPageCache:
+    """
+    Byte-budgeted LRU of the last rendered version of each page, keyed by page ID.
+
+    Every stored page gets a new random version, so a client holding an older version
+    of a page can tell its patches would not apply. Versions are unique across worker
+    processes, so a version issued by another worker never matches a page stored here.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, RenderedPage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stored_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, page_id: str, version: str) -> Optional[RenderedPage]:
+        """The page if version is its latest version"""
+        with self._lock:
+            entry = self._entries.get(page_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("rendered_page", "miss").inc()
+                return None
+            self._entries.move_to_end(page_id)
+            self.hits += 1
+        CACHE_LOOKUPS.labels("rendered_page", "hit").inc()
+        return entry[1]
+
+    def put(self, page_id: str, page: RenderedPage) -> str:
+        """Store page as the latest version of page_id and return that version"""
+        version = uuid.uuid4().hex
+        with self._lock:
+            previous = self._entries.pop(page_id, None)
+            if previous is not None:
+                self._stored_bytes -= previous[1].size
+            if page.size > self.max_bytes:
+                return version
+            self._entries[page_id] = (version, page)
+            self._stored_bytes += page.size
+            while self._stored_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._stored_bytes -= evicted.size
+                self.evictions += 1
+        return version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "stored_bytes": self._stored_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+rendered_pages = RenderedPageCache(max_bytes=int(os.getenv("RENDER_PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.services.ai_service import AIService
+from app.services.design_store import DesignStore
+from app.services.file_service import FileService
+from app.services.upstream_scheduler import UpstreamBusyError
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+class Job:
+    def __init__(self, job_id: str, prompt: str, tech_stack: str):
+        self.id = job_id
+        self.prompt = prompt
+        self.tech_stack = tech_stack
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.generated_chars = 0
+        self.design_id: Optional[str] = None
+        self.html: Optional[str] = None
+        self.error: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def notify(self) -> None:
+        """Wake everyone watching this job"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def updates(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot each time the job changes, ending once it is finished"""
+        while True:
+            changed = self._changed
+            yield self.to_dict()
+            if self.done:
+                return
+            await changed.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "tech_stack": self.tech_stack,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {"generated_chars": self.generated_chars},
+            "design_id": self.design_id,
+            "html": self.html,
+            "error": self.error
+        }
+
+class JobQueue:
+    """
+    Bounded queue of UI generation jobs drained by a fixed pool of async workers.
+
+    Size the worker count to the upstream rate limit; once max_queue jobs are
+    waiting, new submissions are rejected with QueueFullError. Jobs are not shed
+    when Claude is saturated: a job waits for capacity, going back to "queued", and
+    only fails once it has been kept waiting for max_busy_wait seconds.
+    """
+
+    def __init__(
+        self,
+        design_store: DesignStore,
+        workers: int = 4,
+        max_queue: int = 100,
+        max_retained: int = 1000,
+        max_busy_wait: float = 600.0
+    ):
+        self.design_store = design_store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retained = max_retained
+        self.max_busy_wait = max_busy_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the worker pool"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the worker pool"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, prompt: str, tech_stack: str) -> Job:
+        """Queue a generation job and return it immediately"""
+        job = Job(FileService.generate_unique_id(), prompt, tech_stack)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+
+        self._jobs[job.id] = job
+        self._evict_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "retained_jobs": len(self._jobs)
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.notify()
+
+        try:
+            busy_deadline = time.monotonic() + self.max_busy_wait
+            while True:
+                try:
+                    await self._generate(job)
+                    break
+                except UpstreamBusyError as e:
+                    # Raised before any output; wait for Claude to have room for the job
+                    if time.monotonic() + e.retry_after > busy_deadline:
+                        raise
+                    job.status = "queued"
+                    job.notify()
+                    await asyncio.sleep(e.retry_after)
+                    job.status = "running"
+                    job.notify()
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Job cancelled"
+            raise
+        except Exception as e:
+            logging.error(f"Error running job {job.id}: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.notify()
+
+    async def _generate(self, job: Job) -> None:
+        events = await AIService.stream_app_idea_with_claude(job.prompt, job.tech_stack, admit=False)
+        async for event in events:
+            if event["type"] == "chunk":
+                job.generated_chars += len(event["text"])
+                job.notify()
+                continue
+
+            design_id = FileService.generate_unique_id()
+            await run_in_threadpool(self.design_store.put, design_id, event["code"], job.tech_stack)
+            job.design_id = design_id
+            job.html = event["html"]
+
+    def _evict_finished(self) -> None:
+        """Forget the oldest finished jobs once more than max_retained are held"""
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:excess]:
+            del self._jobs[job_id]
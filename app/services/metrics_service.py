@@ -0,0 +1,116 @@
+import os
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+HTTP_REQUESTS = Counter(
+    "ui_generator_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "ui_generator_http_request_duration_seconds", "Time to produce an HTTP response", ["method", "route"],
+    buckets=STAGE_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "ui_generator_http_requests_in_flight", "HTTP requests currently being handled", multiprocess_mode="livesum"
+)
+STAGE_DURATION = Histogram(
+    "ui_generator_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "ui_generator_stage_errors_total", "Pipeline stages that raised an error", ["stage"]
+)
+GENERATIONS_IN_FLIGHT = Gauge(
+    "ui_generator_generations_in_flight", "Claude generations currently running", multiprocess_mode="livesum"
+)
+CLAUDE_TOKENS = Counter(
+    "ui_generator_claude_tokens_total", "Tokens exchanged with Claude", ["direction"]
+)
+CACHE_LOOKUPS = Counter(
+    "ui_generator_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+COALESCED_REQUESTS = Counter(
+    "ui_generator_coalesced_requests_total", "Requests that joined an identical call already in flight", ["kind"]
+)
+UPSTREAM_CONCURRENCY_LIMIT = Gauge(
+    "ui_generator_upstream_concurrency_limit", "Adaptive limit on concurrent Claude calls", multiprocess_mode="livesum"
+)
+UPSTREAM_QUEUED = Gauge(
+    "ui_generator_upstream_queued", "Claude calls waiting for a concurrency slot or rate budget", multiprocess_mode="livesum"
+)
+UPSTREAM_RETRIES = Counter(
+    "ui_generator_upstream_retries_total", "Claude calls retried, by reason", ["reason"]
+)
+UPSTREAM_REJECTED = Counter(
+    "ui_generator_upstream_rejected_total", "Claude calls given up on without a response, by reason", ["reason"]
+)
+HEDGED_REQUESTS = Counter(
+    "ui_generator_hedged_requests_total", "Hedged Claude generations by stack and outcome", ["stack", "outcome"]
+)
+CLIENT_DISCONNECTS = Counter(
+    "ui_generator_client_disconnects_total", "Generations cancelled because the client disconnected", ["endpoint"]
+)
+
+# Spans recorded for the current HTTP request, reported through the Server-Timing header
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage into the stage histogram and the current request's trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+        logging.debug(f"[trace {_request_id.get()}] {stage} took {elapsed * 1000:.2f}ms")
+
+def start_request_trace() -> str:
+    """Begin collecting spans for the current request and return its ID"""
+    request_id = uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    _request_spans.set([])
+    return request_id
+
+def server_timing_header() -> str:
+    """Format the spans of the current request as a Server-Timing header value"""
+    spans = _request_spans.get() or []
+    return ", ".join(f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in spans)
+
+def record_token_usage(usage) -> None:
+    """Count input/output and prompt-cache read/write tokens from an Anthropic usage block"""
+    if usage is None:
+        return
+    CLAUDE_TOKENS.labels("input").inc(getattr(usage, "input_tokens", 0) or 0)
+    CLAUDE_TOKENS.labels("output").inc(getattr(usage, "output_tokens", 0) or 0)
+    CLAUDE_TOKENS.labels("cache_read").inc(getattr(usage, "cache_read_input_tokens", 0) or 0)
+    CLAUDE_TOKENS.labels("cache_write").inc(getattr(usage, "cache_creation_input_tokens", 0) or 0)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render every metric in the Prometheus text format"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate across uvicorn workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,159 +1,371 @@
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+import re
 import json
-import traceback
+import logging
+from functools import lru_cache
+from app.components.templates import UITemplates
+from app.services.stylesheet_cache import Stylesheet, stylesheet_cache
 
-class HTMLRenderer:
-    @staticmethod
-    def generate_html(ui_data: Dict[str, Any]) -> str:
-        """Generate HTML from UI data."""
-        try:
-            print(f"[Renderer] Starting HTML generation")
-            
-            # Extract data
-            components = ui_data.get("ui_components", [])
-            layout = ui_data.get("layout", {})
-            design_tokens = ui_data.get("design_tokens", {})
-            
-            print(f"[Renderer] Components: {json.dumps(components, indent=2)}")
-            print(f"[Renderer] Layout: {json.dumps(layout, indent=2)}")
-            
-            # Generate CSS
-            css = HTMLRenderer._generate_css(design_tokens)
-            
-            # Generate component HTML
-            components_html = ""
-            for component in components:
-                try:
-                    component_html = HTMLRenderer._render_component(component)
-                    components_html += component_html
-                except Exception as e:
-                    print(f"[Renderer] Error rendering component: {str(e)}")
-                    print(f"[Renderer] Component data: {json.dumps(component, indent=2)}")
-                    continue
-            
-            # Apply layout
-            layout_html = HTMLRenderer._render_layout(layout, components_html)
-            
-            # Final HTML
-            html = f"""
+logger = logging.getLogger(__name__)
+
+# The page and layout markup around the rendered components, split at each insertion point
+PAGE_HEAD = """
             <!DOCTYPE html>
             <html lang="en">
             <head>
                 <meta charset="UTF-8">
                 <meta name="viewport" content="width=device-width, initial-scale=1.0">
                 <title>UI Preview</title>
-                <style>
-                    {css}
-                </style>
+                """
+STYLE_HEAD = """<style>
+                    """
+STYLE_TAIL = """
+                </style>"""
+PAGE_BODY = """
             </head>
             <body>
-                {layout_html}
+                """
+PAGE_TAIL = """
             </body>
             </html>
             """
-            
-            print(f"[Renderer] Successfully generated HTML")
+LAYOUT_HEAD = """
+                <div class="container" style=\""""
+LAYOUT_BODY = """">
+                    """
+LAYOUT_TAIL = """
+                </div>
+            """
+
+# Characters of rendered components iter_html collects before yielding them
+STREAM_CHUNK_SIZE = 32 * 1024
+
+# Containers of at most this many leaves are kept as fragments for reuse; larger ones
+# are streamed, as they rarely repeat and would hold the page in memory
+MEMO_MAX_CHILDREN = 64
+MEMO_MAX_ENTRIES = 1024
+
+def _id_attr(props: Dict[str, Any]) -> str:
+    value = props.get("id")
+    return f' id="{value}"' if value else ""
+
+def _class_attr(props: Dict[str, Any]) -> str:
+    value = props.get("className")
+    return f' class="{value}"' if value else ""
+
+def _style_attr(props: Dict[str, Any]) -> str:
+    style = props.get("style")
+    return f' style="{";".join([f"{k}:{v}" for k, v in style.items()])}"' if style else ""
+
+def _render_input(props: Dict[str, Any]) -> str:
+    get = props.get
+    return f"""
+                    <div class="form-group">
+                        <label for="{get("id")}">{get("label", "")}</label>
+                        <input type="{get("type", "text")}"
+                               name="{get("name", "")}"
+                               placeholder="{get("placeholder", "")}"
+                               value="{get("value", "")}"
+                               {"required" if get("required") else ""}
+                               {_id_attr(props)}
+                               class="input{_class_attr(props)}"
+                               {_style_attr(props)}>
+                    </div>
+                """
+
+def _render_button(props: Dict[str, Any]) -> str:
+    get = props.get
+    return f"""
+                    <button{_id_attr(props)} 
+                            class="button{_class_attr(props)}"
+                            {"disabled" if get("disabled") else ""}
+                            {_style_attr(props)}>
+                        {get("text", "Button")}
+                    </button>
+                """
+
+def _render_image(props: Dict[str, Any]) -> str:
+    get = props.get
+    return f"""
+                    <img src="{get("src", "")}"
+                         alt="{get("alt", "")}"
+                         style="object-fit: {get("objectFit", "cover")}{_style_attr(props)}"
+                         {_id_attr(props)}
+                         class="image{_class_attr(props)}">
+                """
+
+def _render_heading(props: Dict[str, Any]) -> str:
+    level = props.get("level", 1)
+    return f"""
+                    <h{level}{_id_attr(props)} 
+                           class="heading{_class_attr(props)}"
+                           {_style_attr(props)}>
+                        {props.get("text", "")}
+                    </h{level}>
+                """
+
+def _render_text(props: Dict[str, Any]) -> str:
+    return f"""
+                    <p{_id_attr(props)} 
+                       class="text{_class_attr(props)}"
+                       {_style_attr(props)}>
+                        {props.get("text", "")}
+                    </p>
+                """
+
+# Component type -> render callable taking the component's props. Each callable is a
+# single compiled f-string that only evaluates the fields its type uses.
+COMPONENT_RENDERERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "input": _render_input,
+    "button": _render_button,
+    "image": _render_image,
+    "heading": _render_heading,
+    "text": _render_text
+}
+
+# Component types that hold nested children -> their HTML tag
+CONTAINER_TAGS = {
+    "card": "div",
+    "container": "div",
+    "grid": "div",
+    "form": "form",
+    "navbar": "nav"
+}
+
+_CAMEL_HUMP = re.compile(r"(?<!^)(?=[A-Z])")
+
+@lru_cache(maxsize=256)
+def _css_property(name: str) -> str:
+    """CSS property name of a camelCase template style key"""
+    return _CAMEL_HUMP.sub("-", name).lower()
+
+def _is_container(component: Any) -> bool:
+    return isinstance(component, dict) and component.get("type") in CONTAINER_TAGS
+
+def _children(component: Dict[str, Any]) -> List[Any]:
+    children = component.get("children")
+    return children if isinstance(children, list) else []
+
+def _container_attributes(component_type: str, props: Dict[str, Any]) -> Dict[str, str]:
+    """Attributes of a container, styled from its UITemplates template and props["style"]"""
+    if component_type == "grid":
+        template = UITemplates.get_layout_template("grid", props)
+    else:
+        template = UITemplates.get_component_template(component_type, props)
+    style = {_css_property(k): v for k, v in template["style"].items()}
+    style.update(props.get("style") or {})
+    attributes = {"id": props["id"]} if props.get("id") else {}
+    attributes["class"] = f"{component_type} {props['className']}" if props.get("className") else component_type
+    attributes["style"] = ";".join([f"{k}:{v}" for k, v in style.items()])
+    return attributes
+
+def _container_open(component_type: str, attributes: Dict[str, str]) -> str:
+    return f"""
+                    <{CONTAINER_TAGS[component_type]}{"".join([f' {k}="{v}"' for k, v in attributes.items()])}>"""
+
+def _container_close(component_type: str) -> str:
+    return f"""
+                    </{CONTAINER_TAGS[component_type]}>
+                """
+
+class _Frame(NamedTuple):
+    children: Iterator[Any]
+    close: str
+
+class SubtreeRenderer:
+    """
+    Renders nested component trees without recursion, reusing repeated subtrees.
+
+    Containers whose children are all leaves (cards, list items, form rows) are
+    looked up by a structural fingerprint of the whole subtree, so a repeated one is
+    rendered once and its HTML reused. Other containers are walked with an explicit
+    stack and streamed, so neither depth nor width is limited by the recursion limit
+    or held in memory. Leaves alone are not memoized: fingerprinting one costs about
+    as much as rendering it. One instance is meant for one page.
+    """
+
+    def __init__(self, max_children: int = MEMO_MAX_CHILDREN, max_entries: int = MEMO_MAX_ENTRIES):
+        self.max_children = max_children
+        self.max_entries = max_entries
+        self._fragments: Dict[str, str] = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def render(self, root: Any) -> Iterator[str]:
+        """The HTML of root and its descendants, skipping nodes that fail to render"""
+        stack = [_Frame(iter((root,)), "")]
+        while stack:
+            frame = stack[-1]
+            # Leaves and reusable containers are handled in this loop; it is left to
+            # enter or finish any other container
+            for node in frame.children:
+                if not _is_container(node):
+                    html = self._render_leaf(node)
+                else:
+                    children = _children(node)
+                    if len(children) <= self.max_children and not any(map(_is_container, children)):
+                        html = self._render_reusable(node, children)
+                    else:
+                        try:
+                            html = _container_open(node["type"], _container_attributes(node["type"], node.get("props", {})))
+                        except Exception as e:
+                            logger.warning(f"Skipping component: Failed to render component: {str(e)}")
+                            continue
+                        self.rendered += 1
+                        stack.append(_Frame(iter(children), _container_close(node["type"])))
+                        yield html
+                        break
+                if html:
+                    yield html
+            else:
+                stack.pop()
+                if frame.close:
+                    yield frame.close
+
+    def stats(self) -> Dict[str, int]:
+        return {"fragments": len(self._fragments), "rendered": self.rendered, "reused": self.reused}
+
+    def _render_leaf(self, node: Any) -> str:
+        try:
+            html = HTMLRenderer._render_component(node)
+        except Exception as e:
+            logger.warning(f"Skipping component: {str(e)}")
+            return ""
+        self.rendered += 1
+        return html
+
+    def _render_reusable(self, node: Dict[str, Any], children: List[Any]) -> str:
+        """A container of leaves, rendered once per structure"""
+        # The repr of JSON data tells apart everything that renders differently,
+        # including True, 1 and 1.0
+        fingerprint = repr(node)
+        html = self._fragments.get(fingerprint)
+        if html is not None:
+            self.reused += 1 + len(children)
             return html
-            
+
+        try:
+            parts = [_container_open(node["type"], _container_attributes(node["type"], node.get("props", {})))]
+        except Exception as e:
+            logger.warning(f"Skipping component: Failed to render component: {str(e)}")
+            html = ""
+        else:
+            self.rendered += 1
+            for child in children:
+                parts.append(self._render_leaf(child))
+            parts.append(_container_close(node["type"]))
+            html = "".join(parts)
+        if len(self._fragments) < self.max_entries:
+            self._fragments[fingerprint] = html
+        return html
+
+class HTMLRenderer:
+    @staticmethod
+    def generate_html(ui_data: Dict[str, Any], stylesheet_base: Optional[str] = None) -> str:
+        """
+        Generate HTML from UI data.
+
+        The design-token CSS is inlined, or linked as stylesheet_base + "<digest>.css"
+        when a base URL is given so browsers fetch it once per theme.
+        """
+        try:
+            # Every piece of the page goes into one buffer, joined once at the end
+            out = HTMLRenderer._page_head(ui_data, stylesheet_base)
+            out.extend(HTMLRenderer._rendered_components(ui_data.get("ui_components", [])))
+            out.append(LAYOUT_TAIL + PAGE_TAIL)
+            return "".join(out)
+
+        except Exception as e:
+            logger.error(f"Error generating HTML: {str(e)}")
+            raise Exception(f"Failed to generate HTML: {str(e)}")
+
+    @staticmethod
+    def iter_html(
+        ui_data: Dict[str, Any],
+        stylesheet_base: Optional[str] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[str]:
+        """
+        Generate the same page as generate_html, piece by piece.
+
+        Yields the head and stylesheet first, then the components in chunks of about
+        chunk_size characters as they are rendered, so only one chunk of the page (and
+        at most MEMO_MAX_ENTRIES reusable subtrees) is held in memory at a time.
+        Anything that fails the page fails before the first chunk; components that fail
+        to render are skipped as in generate_html.
+        """
+        try:
+            head = "".join(HTMLRenderer._page_head(ui_data, stylesheet_base))
         except Exception as e:
-            print(f"[Renderer] Error generating HTML: {str(e)}")
-            print(f"[Renderer] Traceback: {traceback.format_exc()}")
+            logger.error(f"Error generating HTML: {str(e)}")
             raise Exception(f"Failed to generate HTML: {str(e)}")
+        yield head
+
+        chunk: List[str] = []
+        size = 0
+        for html in HTMLRenderer._rendered_components(ui_data.get("ui_components", [])):
+            chunk.append(html)
+            size += len(html)
+            if size >= chunk_size:
+                yield "".join(chunk)
+                chunk = []
+                size = 0
+        chunk.append(LAYOUT_TAIL + PAGE_TAIL)
+        yield "".join(chunk)
+
+    @staticmethod
+    def _page_head(ui_data: Dict[str, Any], stylesheet_base: Optional[str]) -> List[str]:
+        """The page up to the first component."""
+        layout = ui_data.get("layout", {})
+        design_tokens = ui_data.get("design_tokens", {})
+
+        # Serializing the whole document is only worth it when someone reads it
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Components: {json.dumps(ui_data.get('ui_components', []), indent=2)}")
+            logger.debug(f"Layout: {json.dumps(layout, indent=2)}")
+
+        stylesheet = HTMLRenderer._stylesheet(design_tokens)
+        return HTMLRenderer._head(stylesheet, stylesheet_base, HTMLRenderer._layout_style(layout))
+
+    @staticmethod
+    def _head(stylesheet: Stylesheet, stylesheet_base: Optional[str], layout_style: str) -> List[str]:
+        """The page up to the first component, from its parts."""
+        if stylesheet_base is None:
+            out = [PAGE_HEAD, STYLE_HEAD, stylesheet.css, STYLE_TAIL]
+        else:
+            out = [PAGE_HEAD, f'<link rel="stylesheet" href="{stylesheet_base}{stylesheet.filename}">']
+        out += [PAGE_BODY, LAYOUT_HEAD, layout_style, LAYOUT_BODY]
+        return out
+
+    @staticmethod
+    def _rendered_components(components: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """The HTML of each component, skipping those that fail to render."""
+        subtrees: Optional[SubtreeRenderer] = None
+        for component in components:
+            try:
+                if component.get("type") in CONTAINER_TAGS:
+                    # Shared by the page's containers, so repeats across them are reused too
+                    if subtrees is None:
+                        subtrees = SubtreeRenderer()
+                    yield from subtrees.render(component)
+                else:
+                    yield HTMLRenderer._render_component(component)
+            except Exception as e:
+                logger.warning(f"Skipping component: {str(e)}")
 
     @staticmethod
     def _generate_css(design_tokens: Dict[str, Any]) -> str:
         """Generate CSS from design tokens."""
+        return HTMLRenderer._stylesheet(design_tokens).css
+
+    @staticmethod
+    def _stylesheet(design_tokens: Dict[str, Any]) -> Stylesheet:
+        """The memoized stylesheet for design tokens."""
         try:
-            print(f"[Renderer] Generating CSS from design tokens")
-            
-            # Extract tokens
-            colors = design_tokens.get("colors", {})
-            typography = design_tokens.get("typography", {})
-            spacing = design_tokens.get("spacing", {})
-            
-            # Base styles
-            css = """
-                * {
-                    box-sizing: border-box;
-                    margin: 0;
-                    padding: 0;
-                }
-                
-                body {
-                    font-family: %(fontFamily)s;
-                    font-size: %(fontSize)s;
-                    line-height: %(lineHeight)s;
-                    color: %(textColor)s;
-                    background-color: %(bgColor)s;
-                }
-                
-                .container {
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: %(containerPadding)s;
-                }
-                
-                .button {
-                    background-color: %(primaryColor)s;
-                    color: white;
-                    border: none;
-                    padding: %(buttonPadding)s;
-                    border-radius: %(buttonRadius)s;
-                    cursor: pointer;
-                    transition: background-color 0.2s;
-                }
-                
-                .button:hover {
-                    background-color: %(primaryDarkColor)s;
-                }
-                
-                .input {
-                    width: 100%%;
-                    padding: %(inputPadding)s;
-                    border: 1px solid %(borderColor)s;
-                    border-radius: %(inputRadius)s;
-                    font-size: %(inputFontSize)s;
-                }
-                
-                .heading {
-                    color: %(headingColor)s;
-                    margin-bottom: %(headingMargin)s;
-                }
-                
-                .text {
-                    margin-bottom: %(textMargin)s;
-                }
-                
-                .image {
-                    max-width: 100%%;
-                    height: auto;
-                }
-            """ % {
-                "fontFamily": typography.get("fontFamily", "system-ui, -apple-system, sans-serif"),
-                "fontSize": typography.get("fontSize", {}).get("base", "16px"),
-                "lineHeight": typography.get("lineHeight", {}).get("normal", "1.5"),
-                "textColor": colors.get("text", "#000000"),
-                "bgColor": colors.get("background", "#FFFFFF"),
-                "primaryColor": colors.get("primary", "#0066FF"),
-                "primaryDarkColor": colors.get("primary", "#0052CC"),
-                "borderColor": colors.get("border", "#E2E8F0"),
-                "containerPadding": spacing.get("lg", "1.5rem"),
-                "buttonPadding": spacing.get("sm", "0.5rem") + " " + spacing.get("md", "1rem"),
-                "buttonRadius": "0.25rem",
-                "inputPadding": spacing.get("sm", "0.5rem"),
-                "inputRadius": "0.25rem",
-                "inputFontSize": typography.get("fontSize", {}).get("base", "16px"),
-                "headingColor": colors.get("text", "#000000"),
-                "headingMargin": spacing.get("md", "1rem"),
-                "textMargin": spacing.get("sm", "0.5rem")
-            }
-            
-            print(f"[Renderer] Successfully generated CSS")
-            return css
-            
+            return stylesheet_cache.for_tokens(design_tokens)
+
         except Exception as e:
-            print(f"[Renderer] Error generating CSS: {str(e)}")
-            print(f"[Renderer] Traceback: {traceback.format_exc()}")
+            logger.error(f"Error generating CSS: {str(e)}")
             raise Exception(f"Failed to generate CSS: {str(e)}")
 
     @staticmethod
@@ -161,106 +373,45 @@ class HTMLRenderer:
         """Render a single component to HTML."""
         try:
             component_type = component.get("type")
-            props = component.get("props", {})
-            
             if not component_type:
                 raise ValueError("Component missing 'type' field")
-            
-            # Common attributes
-            id_attr = f' id="{props.get("id", "")}"' if props.get("id") else ""
-            class_attr = f' class="{props.get("className", "")}"' if props.get("className") else ""
-            style_attr = f' style="{";".join([f"{k}:{v}" for k,v in props.get("style", {}).items()])}"' if props.get("style") else ""
-            
-            # Render based on type
-            if component_type == "input":
-                return f"""
-                    <div class="form-group">
-                        <label for="{props.get("id")}">{props.get("label", "")}</label>
-                        <input type="{props.get("type", "text")}"
-                               name="{props.get("name", "")}"
-                               placeholder="{props.get("placeholder", "")}"
-                               value="{props.get("value", "")}"
-                               {"required" if props.get("required") else ""}
-                               {id_attr}
-                               class="input{class_attr}"
-                               {style_attr}>
-                    </div>
-                """
-            elif component_type == "button":
-                return f"""
-                    <button{id_attr} 
-                            class="button{class_attr}"
-                            {"disabled" if props.get("disabled") else ""}
-                            {style_attr}>
-                        {props.get("text", "Button")}
-                    </button>
-                """
-            elif component_type == "image":
-                return f"""
-                    <img src="{props.get("src", "")}"
-                         alt="{props.get("alt", "")}"
-                         style="object-fit: {props.get("objectFit", "cover")}{style_attr}"
-                         {id_attr}
-                         class="image{class_attr}">
-                """
-            elif component_type == "heading":
-                level = props.get("level", 1)
-                return f"""
-                    <h{level}{id_attr} 
-                           class="heading{class_attr}"
-                           {style_attr}>
-                        {props.get("text", "")}
-                    </h{level}>
-                """
-            elif component_type == "text":
-                return f"""
-                    <p{id_attr} 
-                       class="text{class_attr}"
-                       {style_attr}>
-                        {props.get("text", "")}
-                    </p>
-                """
-            else:
+
+            render = COMPONENT_RENDERERS.get(component_type)
+            if render is None:
                 raise ValueError(f"Unknown component type: {component_type}")
-                
+            return render(component.get("props", {}))
+
         except Exception as e:
-            print(f"[Renderer] Error rendering component: {str(e)}")
-            print(f"[Renderer] Component data: {json.dumps(component, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Component data: {json.dumps(component, indent=2)}")
             raise Exception(f"Failed to render component: {str(e)}")
 
     @staticmethod
-    def _render_layout(layout: Dict[str, Any], content: str) -> str:
-        """Render the layout with content."""
+    def _layout_style(layout: Dict[str, Any]) -> str:
+        """Inline style of the layout container."""
         try:
             layout_type = layout.get("type", "flex")
             props = layout.get("props", {})
-            
+
             # Generate style based on layout type
-            style = ""
             if layout_type == "flex":
-                style = f"""
+                return f"""
                     display: flex;
                     flex-direction: {props.get("direction", "column")};
                     gap: {props.get("spacing", "1rem")};
                     align-items: {props.get("align", "center")};
                     justify-content: {props.get("justify", "center")};
                 """
-            elif layout_type == "grid":
-                style = f"""
+            if layout_type == "grid":
+                return f"""
                     display: grid;
                     grid-template-columns: {props.get("columns", "1fr")};
                     gap: {props.get("spacing", "1rem")};
                     align-items: {props.get("align", "center")};
                     justify-content: {props.get("justify", "center")};
                 """
-            
-            return f"""
-                <div class="container" style="{style}">
-                    {content}
-                </div>
-            """
-            
+            return ""
+
         except Exception as e:
-            print(f"[Renderer] Error rendering layout: {str(e)}")
-            print(f"[Renderer] Layout data: {json.dumps(layout, indent=2)}")
+            logger.error(f"Error rendering layout: {str(e)}")
             raise Exception(f"Failed to render layout: {str(e)}")
@@ -0,0 +1,360 @@
+"""
+Immutable per-stack generation profiles, built once at import.
+
+A StackProfile holds everything a request needs for its tech stack: the system
+prompt, the preview template pre-split at its insertion points, and the
+post-processor that turns the extracted code into the pieces spliced into it.
+Register a profile to add a stack.
+"""
+from functools import partial
+from typing import Callable, Dict, NamedTuple, Tuple
+
+from app.services.code_extractor import CodeExtractor, StreamingCodeParser
+
+DEFAULT_STACK = "html-tailwind"
+
+REACT_STATE_MARKER = "// Generated state declarations will be inserted here"
+REACT_UI_MARKER = "{/* Generated UI code will be inserted here */}"
+HTML_MARKER = "<!-- Your HTML code will be inserted here -->"
+
+REACT_TAILWIND_CDN = '''<script src="https://unpkg.com/react@18/umd/react.development.js"></script>
+<script src="https://unpkg.com/react-dom@18/umd/react-dom.development.js"></script>
+<script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>
+<script src="https://cdn.tailwindcss.com"></script>
+<script src="https://unpkg.com/typescript@latest/lib/typescript.js"></script>'''
+
+HTML_TAILWIND_CDN = '''<script src="https://cdn.tailwindcss.com"></script>
+<script>
+    tailwind.config = {
+        darkMode: 'class',
+        theme: {
+            extend: {}
+        }
+    }
+</script>
+<script>
+    // Add dark mode toggle functionality
+    function toggleDarkMode() {
+        document.documentElement.classList.toggle('dark');
+    }
+</script>'''
+
+HTML_BOOTSTRAP_CDN = '''<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
+<script src="https://code.jquery.com/jquery-3.7.1.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist/umd/popper.min.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
+<style>
+    /* Add dark mode support */
+    [data-bs-theme="dark"] {
+        color-scheme: dark;
+    }
+</style>
+<script>
+    // Add dark mode toggle functionality
+    function toggleDarkMode() {
+        document.documentElement.setAttribute('data-bs-theme',
+            document.documentElement.getAttribute('data-bs-theme') === 'dark' ? 'light' : 'dark'
+        );
+    }
+</script>'''
+
+HTML_MATERIAL_CDN = '''<link href="https://fonts.googleapis.com/css?family=Roboto:300,400,500,700&display=swap" rel="stylesheet">
+<link href="https://fonts.googleapis.com/icon?family=Material+Icons" rel="stylesheet">
+<link href="https://unpkg.com/@material/web/dist/material.min.css" rel="stylesheet">
+<script src="https://unpkg.com/@material/web/dist/material.min.js"></script>
+<style>
+    /* Add Material Design dark theme */
+    :root {
+        --mdc-theme-primary: #6200ee;
+        --mdc-theme-secondary: #03dac6;
+    }
+    [data-theme="dark"] {
+        --mdc-theme-primary: #bb86fc;
+        --mdc-theme-secondary: #03dac6;
+        --mdc-theme-background: #121212;
+        --mdc-theme-surface: #121212;
+        --mdc-theme-on-surface: #ffffff;
+    }
+    body {
+        margin: 0;
+        font-family: 'Roboto', sans-serif;
+    }
+</style>
+<script>
+    // Add dark mode toggle functionality
+    function toggleDarkMode() {
+        document.documentElement.setAttribute('data-theme',
+            document.documentElement.getAttribute('data-theme') === 'dark' ? 'light' : 'dark'
+        );
+    }
+</script>'''
+
+REACT_SYSTEM_PROMPT = '''You are an expert UI developer. Generate a React component that implements the user's requested UI design.
+Follow these rules strictly:
+1. Use plain React with hooks (no TypeScript)
+2. For state declarations:
+   - Use useState (it's already destructured from React)
+   - Place all state declarations at the top of the component
+   - Use simple JavaScript objects/arrays
+   Example:
+   const [count, setCount] = useState(0);
+   const [items, setItems] = useState([
+     { id: 1, name: "Item 1", price: 10.99 },
+     { id: 2, name: "Item 2", price: 20.50 }
+   ]);
+
+3. For numbers and prices:
+   - Use actual numbers, not strings
+   - Use dots for decimals, not colons
+   Example:
+   { price: 99.99 }  // Correct
+   { price: "99:99" }  // Wrong
+
+4. For JSX:
+   - Use Tailwind CSS for styling
+   - Ensure all JSX is wrapped in a single parent div
+   Example:
+   return (
+     <div className="p-4 bg-white">
+       <h1 className="text-2xl">Title</h1>
+       {items.map(item => (
+         <div key={item.id} className="mt-2">
+           {item.name} - ${item.price}
+         </div>
+       ))}
+     </div>
+   );
+
+5. Never:
+   - Create additional components
+   - Use TypeScript syntax
+   - Use import/export statements
+   - Use inline styles
+   - Use React.useState (use useState directly)
+
+Output Format:
+const [state1, setState1] = useState(initialValue1);
+const [state2, setState2] = useState(initialValue2);
+
+return (
+  <div className="...">
+    {/* JSX content */}
+  </div>
+);'''
+
+REACT_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <script src="https://cdn.tailwindcss.com"></script>
+    <script>
+        tailwind.config = {
+            darkMode: 'class',
+            theme: {
+                extend: {}
+            }
+        }
+    </script>
+</head>
+<body>
+    <div id="root"></div>
+    <script src="https://unpkg.com/react@18/umd/react.development.js" crossorigin></script>
+    <script src="https://unpkg.com/react-dom@18/umd/react-dom.development.js" crossorigin></script>
+    <script src="https://unpkg.com/@babel/standalone/babel.min.js"></script>
+    <script type="text/babel">
+        (() => {
+            const { useState, useEffect } = React;
+            const rootElement = document.getElementById('root');
+            const root = ReactDOM.createRoot(rootElement);
+
+            function App() {
+                const [darkMode, setDarkMode] = useState(
+                    window.matchMedia('(prefers-color-scheme: dark)').matches
+                );
+
+                useEffect(() => {
+                    const mediaQuery = window.matchMedia('(prefers-color-scheme: dark)');
+                    const handleChange = (e) => setDarkMode(e.matches);
+                    mediaQuery.addEventListener('change', handleChange);
+                    return () => mediaQuery.removeEventListener('change', handleChange);
+                }, []);
+
+                // Generated state declarations will be inserted here
+
+                return (
+                    <div className={darkMode ? 'dark' : ''}>
+                        <div className="min-h-screen bg-white dark:bg-gray-900 transition-colors duration-200">
+                            {/* Generated UI code will be inserted here */}
+                        </div>
+                    </div>
+                );
+            }
+
+            root.render(
+                <React.StrictMode>
+                    <App />
+                </React.StrictMode>
+            );
+        })();
+    </script>
+</body>
+</html>'''
+
+def _html_system_prompt(name: str, framework: str, rules: str) -> str:
+    return f"""You are an expert UI developer specializing in {name}.
+                Generate clean, modern, and responsive UI code based on the user's requirements.
+                Focus on creating a beautiful and intuitive user interface.
+
+                Rules for {framework}:
+{rules}"""
+
+def _html_template(cdn: str, body: str) -> str:
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>UI Preview</title>
+    {cdn}
+</head>
+{body}
+    <div class="min-h-screen">
+        {HTML_MARKER}
+    </div>
+</body>
+</html>'''
+
+def _html_post_processor(code: str) -> Dict[str, str]:
+    return {"ui": code.strip()}
+
+class StackProfile(NamedTuple):
+    key: str
+    name: str
+    description: str
+    cdn: str
+    system_prompt: str
+    # The template split at each insertion point: one more part than there are slots
+    template_parts: Tuple[str, ...]
+    # (slot name, marker) for each insertion point, in template order
+    slots: Tuple[Tuple[str, str], ...]
+    # Extracted code -> {slot name: code} to splice into the template
+    post_processor: Callable[[str], Dict[str, str]]
+    # Incremental counterpart of post_processor for streamed responses
+    create_stream_parser: Callable[[], StreamingCodeParser]
+
+    @classmethod
+    def build(
+        cls,
+        key: str,
+        name: str,
+        description: str,
+        cdn: str,
+        system_prompt: str,
+        template: str,
+        slots: Tuple[Tuple[str, str], ...],
+        post_processor: Callable[[str], Dict[str, str]],
+        create_stream_parser: Callable[[], StreamingCodeParser]
+    ) -> "StackProfile":
+        """Build a profile, splitting the template at each slot's marker"""
+        parts = []
+        rest = template
+        for _, marker in slots:
+            if template.count(marker) != 1 or marker not in rest:
+                raise ValueError(f"Template for {key} must contain {marker!r} once, after the previous slot")
+            part, _, rest = rest.partition(marker)
+            parts.append(part)
+        parts.append(rest)
+        return cls(key, name, description, cdn, system_prompt, tuple(parts), slots, post_processor, create_stream_parser)
+
+    @property
+    def template(self) -> str:
+        """The template with its markers in place"""
+        return self.splice({})
+
+    def splice(self, pieces: Dict[str, str]) -> str:
+        """Join the template around the code for each slot; a slot without code keeps its marker"""
+        output = [self.template_parts[0]]
+        for (slot, marker), part in zip(self.slots, self.template_parts[1:]):
+            output.append(pieces.get(slot, marker))
+            output.append(part)
+        return "".join(output)
+
+STACK_PROFILES: Dict[str, StackProfile] = {}
+
+def register_stack_profile(profile: StackProfile) -> None:
+    STACK_PROFILES[profile.key] = profile
+
+def get_stack_profile(tech_stack: str) -> StackProfile:
+    """The profile for tech_stack, falling back to HTML + Tailwind for unknown stacks"""
+    return STACK_PROFILES.get(tech_stack) or STACK_PROFILES[DEFAULT_STACK]
+
+HTML_SLOTS = (("ui", HTML_MARKER),)
+create_html_parser = partial(StreamingCodeParser, react=False)
+
+register_stack_profile(StackProfile.build(
+    key="react-tailwind",
+    name="React + TypeScript + Tailwind CSS",
+    description="Modern React with TypeScript and utility-first CSS",
+    cdn=REACT_TAILWIND_CDN,
+    system_prompt=REACT_SYSTEM_PROMPT,
+    template=REACT_TEMPLATE,
+    slots=(("state", REACT_STATE_MARKER), ("ui", REACT_UI_MARKER)),
+    post_processor=CodeExtractor.clean_react_preview,
+    create_stream_parser=partial(StreamingCodeParser, react=True)
+))
+
+register_stack_profile(StackProfile.build(
+    key="html-tailwind",
+    name="HTML + JavaScript + Tailwind CSS",
+    description="HTML with JavaScript and utility-first CSS framework",
+    cdn=HTML_TAILWIND_CDN,
+    system_prompt=_html_system_prompt("HTML + JavaScript + Tailwind CSS", "HTML + Tailwind", """                - Use semantic HTML5 elements
+                - Follow Tailwind CSS best practices
+                - Add proper dark mode classes (dark:)
+                - Make the UI fully responsive
+                - Add proper ARIA attributes for accessibility
+                - Use the provided toggleDarkMode() function for dark mode
+                - Add relevant unsplash images wherever needed or else have a placeholder
+                - Include proper loading states and error handling"""),
+    template=_html_template(HTML_TAILWIND_CDN, '<body class="bg-gray-100 dark:bg-gray-900">'),
+    slots=HTML_SLOTS,
+    post_processor=_html_post_processor,
+    create_stream_parser=create_html_parser
+))
+
+register_stack_profile(StackProfile.build(
+    key="html-bootstrap",
+    name="HTML + JavaScript + Bootstrap 5",
+    description="HTML with JavaScript and Bootstrap components",
+    cdn=HTML_BOOTSTRAP_CDN,
+    system_prompt=_html_system_prompt("HTML + JavaScript + Bootstrap 5", "Bootstrap", """                - Use Bootstrap 5 components and utilities
+                - Follow Bootstrap best practices
+                - Add proper dark mode support using data-bs-theme
+                - Make the UI fully responsive using Bootstrap's grid
+                - Add proper ARIA attributes for accessibility
+                - Use the provided toggleDarkMode() function for dark mode
+                - Include proper loading states and error handling"""),
+    template=_html_template(HTML_BOOTSTRAP_CDN, '<body class="bg-light">'),
+    slots=HTML_SLOTS,
+    post_processor=_html_post_processor,
+    create_stream_parser=create_html_parser
+))
+
+register_stack_profile(StackProfile.build(
+    key="html-material",
+    name="HTML + JavaScript + Material UI",
+    description="HTML with JavaScript and Material Design components",
+    cdn=HTML_MATERIAL_CDN,
+    system_prompt=_html_system_prompt("HTML + JavaScript + Material UI", "Material UI", """                - Use Material Design Web Components (MDC Web)
+                - Follow Material Design principles
+                - Add proper dark mode support using data-theme
+                - Make the UI fully responsive
+                - Add proper ARIA attributes for accessibility
+                - Use the provided toggleDarkMode() function for dark mode
+                - Include proper loading states and error handling"""),
+    template=_html_template(HTML_MATERIAL_CDN, "<body>"),
+    slots=HTML_SLOTS,
+    post_processor=_html_post_processor,
+    create_stream_parser=create_html_parser
+))
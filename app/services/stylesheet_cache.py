@@ -0,0 +1,206 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+from app.services.metrics_service import CACHE_LOOKUPS
+
+# Base styles, filled in from the design tokens
+CSS_TEMPLATE = """
+                * {
+                    box-sizing: border-box;
+                    margin: 0;
+                    padding: 0;
+                }
+                
+                body {
+                    font-family: %(fontFamily)s;
+                    font-size: %(fontSize)s;
+                    line-height: %(lineHeight)s;
+                    color: %(textColor)s;
+                    background-color: %(bgColor)s;
+                }
+                
+                .container {
+                    max-width: 1200px;
+                    margin: 0 auto;
+                    padding: %(containerPadding)s;
+                }
+                
+                .button {
+                    background-color: %(primaryColor)s;
+                    color: white;
+                    border: none;
+                    padding: %(buttonPadding)s;
+                    border-radius: %(buttonRadius)s;
+                    cursor: pointer;
+                    transition: background-color 0.2s;
+                }
+                
+                .button:hover {
+                    background-color: %(primaryDarkColor)s;
+                }
+                
+                .input {
+                    width: 100%%;
+                    padding: %(inputPadding)s;
+                    border: 1px solid %(borderColor)s;
+                    border-radius: %(inputRadius)s;
+                    font-size: %(inputFontSize)s;
+                }
+                
+                .heading {
+                    color: %(headingColor)s;
+                    margin-bottom: %(headingMargin)s;
+                }
+                
+                .text {
+                    margin-bottom: %(textMargin)s;
+                }
+                
+                .image {
+                    max-width: 100%%;
+                    height: auto;
+                }
+            """
+
+# Stylesheet file names: the content digest plus ".css"
+STYLESHEET_NAME = re.compile(r"^[0-9a-f]{64}\.css$")
+
+def css_params(design_tokens: Dict[str, Any]) -> Dict[str, Any]:
+    """The values CSS_TEMPLATE is filled in with"""
+    colors = design_tokens.get("colors", {})
+    typography = design_tokens.get("typography", {})
+    spacing = design_tokens.get("spacing", {})
+    return {
+        "fontFamily": typography.get("fontFamily", "system-ui, -apple-system, sans-serif"),
+        "fontSize": typography.get("fontSize", {}).get("base", "16px"),
+        "lineHeight": typography.get("lineHeight", {}).get("normal", "1.5"),
+        "textColor": colors.get("text", "#000000"),
+        "bgColor": colors.get("background", "#FFFFFF"),
+        "primaryColor": colors.get("primary", "#0066FF"),
+        "primaryDarkColor": colors.get("primary", "#0052CC"),
+        "borderColor": colors.get("border", "#E2E8F0"),
+        "containerPadding": spacing.get("lg", "1.5rem"),
+        "buttonPadding": spacing.get("sm", "0.5rem") + " " + spacing.get("md", "1rem"),
+        "buttonRadius": "0.25rem",
+        "inputPadding": spacing.get("sm", "0.5rem"),
+        "inputRadius": "0.25rem",
+        "inputFontSize": typography.get("fontSize", {}).get("base", "16px"),
+        "headingColor": colors.get("text", "#000000"),
+        "headingMargin": spacing.get("md", "1rem"),
+        "textMargin": spacing.get("sm", "0.5rem")
+    }
+
+class Stylesheet(NamedTuple):
+    css: str
+    digest: str
+
+    @classmethod
+    def from_css(cls, css: str) -> "Stylesheet":
+        return cls(css, hashlib.sha256(css.encode("utf-8")).hexdigest())
+
+    @property
+    def filename(self) -> str:
+        return f"{self.digest}.css"
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+class StylesheetCache:
+    """
+    Stylesheets built from design tokens, memoized per design-token fingerprint.
+
+    The fingerprint is the tuple of token values the stylesheet reads, which is far
+    cheaper to build than a hash of the whole token dict, and lets themes that only
+    differ in unused tokens share a stylesheet. Stylesheets are also looked up by
+    content digest for serving; with a cache directory they are written there too,
+    so any worker can serve a stylesheet another worker rendered a page for.
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._by_fingerprint: "OrderedDict[Tuple[Any, ...], Stylesheet]" = OrderedDict()
+        self._by_digest: Dict[str, Stylesheet] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def for_tokens(self, design_tokens: Dict[str, Any]) -> Stylesheet:
+        """The stylesheet for design_tokens, built once per fingerprint"""
+        params = css_params(design_tokens)
+        fingerprint = tuple(params.values())
+        with self._lock:
+            stylesheet = self._by_fingerprint.get(fingerprint)
+            if stylesheet is not None:
+                self._by_fingerprint.move_to_end(fingerprint)
+                self.hits += 1
+        if stylesheet is not None:
+            CACHE_LOOKUPS.labels("stylesheet", "hit").inc()
+            return stylesheet
+
+        stylesheet = Stylesheet.from_css(CSS_TEMPLATE % params)
+        with self._lock:
+            self.misses += 1
+            self._by_fingerprint[fingerprint] = stylesheet
+            self._by_digest[stylesheet.digest] = stylesheet
+            while len(self._by_fingerprint) > self.max_entries:
+                _, evicted = self._by_fingerprint.popitem(last=False)
+                self._by_digest.pop(evicted.digest, None)
+        CACHE_LOOKUPS.labels("stylesheet", "miss").inc()
+        self._write_disk(stylesheet)
+        return stylesheet
+
+    def get(self, filename: str) -> Optional[Stylesheet]:
+        """The stylesheet served as filename ("<digest>.css"), or None"""
+        if not STYLESHEET_NAME.match(filename):
+            return None
+        digest = filename[:-len(".css")]
+        with self._lock:
+            stylesheet = self._by_digest.get(digest)
+        if stylesheet is not None or not self.cache_dir:
+            return stylesheet
+        try:
+            css = (self.cache_dir / filename).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Error reading stylesheet {filename}: {str(e)}")
+            return None
+        return Stylesheet(css, digest)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._by_fingerprint),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_enabled": self.cache_dir is not None
+            }
+
+    def _write_disk(self, stylesheet: Stylesheet) -> None:
+        if not self.cache_dir:
+            return
+        path = self.cache_dir / stylesheet.filename
+        if path.exists():
+            return
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(stylesheet.css, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.error(f"Error writing stylesheet {stylesheet.filename}: {str(e)}")
+
+stylesheet_cache = StylesheetCache(
+    max_entries=int(os.getenv("STYLESHEET_CACHE_MAX_ENTRIES", "256")),
+    cache_dir=os.getenv("STYLESHEET_CACHE_DIR", str(Path(__file__).parent.parent.parent / ".cache" / "stylesheets")) or None
+)
@@ -0,0 +1,345 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from anthropic import APIConnectionError
+from app.services.metrics_service import (
+    UPSTREAM_CONCURRENCY_LIMIT,
+    UPSTREAM_QUEUED,
+    UPSTREAM_REJECTED,
+    UPSTREAM_RETRIES,
+    span
+)
+
+# Statuses worth retrying; 429 and 529 also mean the upstream wants less concurrency
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+OVERLOAD_STATUSES = {429, 529}
+
+class UpstreamBusyError(Exception):
+    """Raised when a Claude call could not be admitted or kept being rate limited"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        # Seconds the client should wait before retrying, for the Retry-After header
+        self.retry_after = max(1.0, retry_after)
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; a rate of 0 disables it"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.available = per_minute
+        self._refill_rate = per_minute / 60
+        self._updated = time.monotonic()
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # A request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self._refill_rate
+
+    def take(self, amount: float) -> None:
+        if self.capacity:
+            self._refill()
+            self.available -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return an over-estimate, or charge more (negative amount) when usage exceeded it"""
+        if self.capacity:
+            self._refill()
+            self.available = min(self.capacity, self.available + amount)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self._refill_rate)
+        self._updated = now
+
+class _Waiter:
+    def __init__(self):
+        self.event = asyncio.Event()
+
+class UpstreamScheduler:
+    """
+    Client-side scheduler shared by every Claude call.
+
+    Calls wait in a bounded FIFO queue until a concurrency slot and enough of the
+    requests-per-minute and tokens-per-minute budgets are free. A call is turned
+    away at once, rather than left to time out, when the queue is full or its
+    estimated wait exceeds max_wait. The concurrency
+    limit adapts AIMD-style: it grows by about one per limit's worth of successful
+    calls and halves when Claude answers 429 or 529. Retryable failures are retried
+    with jittered exponential backoff, or after the retry-after the response asked for.
+
+    Admission is checked once per call, on its first attempt, so the retries of an
+    admitted call are not turned away. Callers that hold work in a queue of their own
+    pass admit=False to skip the check; they still give up after max_wait in the queue.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        max_queue: int = 100,
+        max_wait: float = 30.0,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        expected_call_seconds: float = 20.0
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._last_decrease = 0.0
+        # Moving average of how long a call holds its slot, for wait estimates
+        self.call_seconds = expected_call_seconds
+        self.retries = 0
+        self.rejected = 0
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limit)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int, admit: bool = True) -> Any:
+        """Call fn() once admitted, retrying retryable failures"""
+        attempt = 0
+        while True:
+            async with self._slot(estimated_tokens, admit and attempt == 0) as settle:
+                try:
+                    result = await fn()
+                except Exception as e:
+                    delay = self._failed(e, attempt)
+                else:
+                    self._succeeded()
+                    settle(getattr(result, "usage", None))
+                    return result
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def stream(self, open_stream: Callable[[], Any], estimated_tokens: int, admit: bool = True) -> AsyncIterator[Any]:
+        """
+        Enter the stream context manager returned by open_stream() once admitted.
+
+        Failures while opening the stream are retried; once it is open the slot is
+        held until the caller's block exits, and errors after that are not retried
+        because output may already have been used.
+        """
+        attempt = 0
+        while True:
+            async with self._slot(estimated_tokens, admit and attempt == 0) as settle:
+                manager = open_stream()
+                try:
+                    stream = await manager.__aenter__()
+                except Exception as e:
+                    delay = self._failed(e, attempt)
+                else:
+                    try:
+                        yield stream
+                    except BaseException as e:
+                        if not await manager.__aexit__(type(e), e, e.__traceback__):
+                            if isinstance(e, Exception):
+                                self._observe_failure(e)
+                            raise
+                    else:
+                        await manager.__aexit__(None, None, None)
+                        self._succeeded()
+                        snapshot = getattr(stream, "current_message_snapshot", None)
+                        settle(getattr(snapshot, "usage", None))
+                    return
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def check_admission(self) -> None:
+        """Raise UpstreamBusyError if a new call would be turned away right now"""
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+            raise UpstreamBusyError("Too many generations are waiting for Claude", self.estimated_wait())
+
+        wait = self.estimated_wait()
+        if wait > self.max_wait:
+            self._reject("estimated_wait")
+            raise UpstreamBusyError(
+                f"Claude is saturated: estimated wait {wait:.0f}s exceeds {self.max_wait:g}s",
+                wait
+            )
+
+    def estimated_wait(self) -> float:
+        """Seconds a call arriving now would wait before being admitted"""
+        slots = max(int(self.limit), 1)
+        # Calls that must finish before a slot frees up for this one
+        ahead = self.in_flight + len(self._waiters) - slots + 1
+        concurrency_wait = ahead / slots * self.call_seconds if ahead > 0 else 0.0
+        return max(concurrency_wait, self.requests.delay_for(len(self._waiters) + 1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "call_seconds": round(self.call_seconds, 2),
+            "estimated_wait": round(self.estimated_wait(), 1),
+            "requests_available": round(self.requests.available, 1) if self.requests.capacity else None,
+            "tokens_available": round(self.tokens.available) if self.tokens.capacity else None,
+            "retries": self.retries,
+            "rejected": self.rejected
+        }
+
+    @asynccontextmanager
+    async def _slot(self, estimated_tokens: int, admit: bool) -> AsyncIterator[Callable[[Any], None]]:
+        """
+        Wait for a concurrency slot and rate budget, after the admission check if admit.
+
+        Yields a settle(usage) callback that corrects the token budget once the real
+        usage is known.
+        """
+        await self._acquire(estimated_tokens, admit)
+        start = time.monotonic()
+
+        def settle(usage: Any) -> None:
+            if usage is None:
+                return
+            used = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+            self.tokens.give_back(estimated_tokens - used)
+
+        try:
+            yield settle
+        finally:
+            self.call_seconds += 0.2 * (time.monotonic() - start - self.call_seconds)
+            self.in_flight -= 1
+            self._wake_head()
+
+    async def _acquire(self, estimated_tokens: int, admit: bool) -> None:
+        if admit:
+            self.check_admission()
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        UPSTREAM_QUEUED.inc()
+        deadline = time.monotonic() + self.max_wait
+        try:
+            with span("upstream_wait"):
+                while True:
+                    delay = None
+                    if self._waiters[0] is waiter and self.in_flight < int(self.limit):
+                        delay = max(self.requests.delay_for(1), self.tokens.delay_for(estimated_tokens))
+                        if delay == 0:
+                            self.requests.take(1)
+                            self.tokens.take(estimated_tokens)
+                            self.in_flight += 1
+                            return
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject("wait_timeout")
+                        raise UpstreamBusyError(
+                            f"Timed out after {self.max_wait:g}s waiting for Claude capacity",
+                            self.estimated_wait()
+                        )
+                    waiter.event.clear()
+                    try:
+                        await asyncio.wait_for(waiter.event.wait(), timeout=min(remaining, delay or remaining))
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._waiters.remove(waiter)
+            UPSTREAM_QUEUED.dec()
+            self._wake_head()
+
+    def _wake_head(self) -> None:
+        if self._waiters:
+            self._waiters[0].event.set()
+
+    def _succeeded(self) -> None:
+        # Additive increase: about +1 once a full limit's worth of calls has succeeded
+        self._set_limit(self.limit + 1 / self.limit)
+
+    def _failed(self, error: Exception, attempt: int) -> float:
+        """Record a failed call and return the delay before retrying it, or re-raise"""
+        status = self._observe_failure(error)
+        retryable = isinstance(error, APIConnectionError) or status in RETRYABLE_STATUSES
+        if not retryable:
+            raise error
+
+        retry_after = self._retry_after(error)
+        if attempt >= self.max_retries:
+            self._reject("retries_exhausted")
+            if status in OVERLOAD_STATUSES:
+                raise UpstreamBusyError(
+                    f"Claude is rate limiting requests: {str(error)}",
+                    retry_after or self.estimated_wait()
+                ) from error
+            raise error
+
+        if retry_after is not None:
+            # Honour retry-after, with a little jitter so waiting calls don't retry in lockstep
+            delay = retry_after + random.uniform(0, self.base_backoff)
+        else:
+            # Full jitter exponential backoff
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        self.retries += 1
+        UPSTREAM_RETRIES.labels(str(status) if status else "connection").inc()
+        logging.warning(f"Retrying Claude call in {delay:.2f}s after: {str(error)}")
+        return delay
+
+    def _observe_failure(self, error: Exception) -> Optional[int]:
+        status = getattr(error, "status_code", None)
+        if status in OVERLOAD_STATUSES:
+            # Multiplicative decrease, at most once per second so one burst of errors counts once
+            now = time.monotonic()
+            if now - self._last_decrease >= 1.0:
+                self._last_decrease = now
+                self._set_limit(self.limit / 2)
+        return status
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(float(self.max_concurrency), max(float(self.min_concurrency), limit))
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.limit)
+        self._wake_head()
+
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return min(float(headers["retry-after-ms"]) / 1000, self.max_backoff)
+            if "retry-after" in headers:
+                return min(float(headers["retry-after"]), self.max_backoff)
+        except ValueError:
+            # An HTTP date: fall back to backoff
+            return None
+        return None
+
+    def _reject(self, reason: str) -> None:
+        self.rejected += 1
+        UPSTREAM_REJECTED.labels(reason).inc()
+
+upstream_scheduler = UpstreamScheduler(
+    requests_per_minute=float(os.getenv("CLAUDE_REQUESTS_PER_MINUTE", "50")),
+    tokens_per_minute=float(os.getenv("CLAUDE_TOKENS_PER_MINUTE", "0")),
+    max_concurrency=int(os.getenv("CLAUDE_MAX_CONCURRENCY", "8")),
+    min_concurrency=int(os.getenv("CLAUDE_MIN_CONCURRENCY", "1")),
+    max_queue=int(os.getenv("CLAUDE_QUEUE_SIZE", "100")),
+    max_wait=float(os.getenv("CLAUDE_QUEUE_TIMEOUT", "30")),
+    max_retries=int(os.getenv("CLAUDE_MAX_RETRIES", "4")),
+    expected_call_seconds=float(os.getenv("CLAUDE_EXPECTED_CALL_SECONDS", "20"))
+)
@@ -0,0 +1,230 @@
+"""
+Realistic and pathological model outputs and UI documents for the hot-path benchmarks.
+"""
+from typing import Any, Dict, List
+
+REACT_STATE = '''const [count, setCount] = useState(0);
+const [items, setItems] = useState([
+  { id: 1, name: "Item 1", price: "10.99" },
+  { id: 2, name: "Item 2", price: "20.50" },
+  { id: 3, name: "Item 3", price: React.useState }
+]);
+const [time, setTime] = useState("12:30");'''
+
+REACT_JSX = '''return (
+  <div className="p-4 bg-white dark:bg-gray-900">
+    <h1 className="text-2xl font-bold">Shop</h1>
+    {items.map(item => (
+      <div key={item.id} className="mt-2 flex justify-between">
+        <span>{item.name}</span>
+        <span>${item.price}</span>
+        <button onClick={() => setCount(count + 1)} className="px-2 py-1 rounded bg-blue-500 text-white">Add</button>
+      </div>
+    ))}
+    <p className="mt-4">Items in cart: {count}</p>
+  </div>
+);'''
+
+REACT_RESPONSE = f'''Here is a shop UI with a cart counter. It keeps the item list in state.
+
+```jsx
+{REACT_STATE}
+
+{REACT_JSX}
+```
+
+The component uses Tailwind classes for styling and supports dark mode.'''
+
+# Responses with more than one return: the component's is not always the first
+REACT_EFFECT_RESPONSE = '''```jsx
+const [seconds, setSeconds] = useState(0);
+useEffect(() => {
+  const id = setInterval(() => setSeconds(s => s + 1), 1000);
+  return () => clearInterval(id);
+}, []);
+
+return (
+  <div className="p-4">Elapsed: {seconds}s</div>
+);
+```'''
+
+REACT_MAP_RETURN_RESPONSE = '''```jsx
+const [items, setItems] = useState([{ id: 1, name: "Tea", done: false }]);
+
+return (
+  <ul className="p-4">
+    {items.map(item => {
+      const label = item.done ? "Done" : "Open";
+      return (
+        <li key={item.id}>{item.name}: {label}</li>
+      );
+    })}
+  </ul>
+);
+```'''
+
+REACT_HELPER_RESPONSE = '''```jsx
+const [price, setPrice] = useState(12.5);
+const formatPrice = (value) => {
+  return "$" + value.toFixed(2);
+};
+
+return (
+  <div className="p-4">
+    <span>{formatPrice(price)}</span>
+  </div>
+);
+```'''
+
+HTML_RESPONSE = '''Sure! Here's the landing page:
+
+```html
+<header class="bg-white dark:bg-gray-800 shadow">
+  <nav class="max-w-7xl mx-auto px-4 py-4 flex justify-between" aria-label="Main">
+    <a href="#" class="text-xl font-bold">FitTrack</a>
+    <button onclick="toggleDarkMode()" class="px-3 py-1 rounded border">Toggle theme</button>
+  </nav>
+</header>
+<main class="max-w-7xl mx-auto px-4 py-12">
+  <h1 class="text-4xl font-bold">Train smarter</h1>
+</main>
+```'''
+
+TS_PROJECT = '''interface Item {
+  id: number;
+  name: string;
+  price: number;
+}
+
+interface CartProps {
+  items: Item[];
+  onRemove: (id: number) => void;
+}
+
+const ItemCard = ({ item }: { item: Item }) => {
+  return (
+    <div className="p-4 rounded shadow">{item.name} - ${item.price}</div>
+  );
+});
+
+const Cart = ({ items, onRemove }: CartProps) => {
+  return (
+    <ul>{items.map(item => <li key={item.id} onClick={() => onRemove(item.id)}>{item.name}</li>)}</ul>
+  );
+});
+
+const App = () => {
+  const [items, setItems] = useState<Item[]>([]);
+  return (
+    <div className="min-h-screen">
+      {items.map(item => <ItemCard key={item.id} item={item} />)}
+      <Cart items={items} onRemove={id => setItems(items.filter(i => i.id !== id))} />
+    </div>
+  );
+});
+'''
+
+def large_jsx(rows: int = 1500) -> str:
+    """A ~100 KB return block with many sibling elements"""
+    body = "\n".join(
+        f'    <div key="{i}" className="p-2 border-b flex justify-between"><span>Row {i}</span><span>{{values[{i}]}}</span></div>'
+        for i in range(rows)
+    )
+    return f"return (\n  <div className=\"p-4\">\n{body}\n  </div>\n);"
+
+def nested_jsx(depth: int = 500) -> str:
+    """JSX nested depth levels deep"""
+    opening = "".join(f'{"  " * i}<div className="level-{i}">\n' for i in range(depth))
+    closing = "".join(f'{"  " * i}</div>\n' for i in reversed(range(depth)))
+    return f"return (\n{opening}{'  ' * depth}<span>leaf</span>\n{closing});"
+
+def large_response() -> str:
+    return f"Here you go:\n\n```jsx\n{REACT_STATE}\n\n{large_jsx()}\n```\nEnjoy!"
+
+def unterminated_response() -> str:
+    """A response cut off by max_tokens in the middle of the fence"""
+    return f"Here you go:\n\n```jsx\n{REACT_STATE}\n\n{large_jsx(400)[:-200]}"
+
+def unclosed_comment_response(lines: int = 2000) -> str:
+    """State followed by a block comment that is never closed, with a "/" on every line"""
+    comment = "// TODO: wire up <Cart /> to the /api/items endpoint\n" * lines
+    return f"Here you go:\n\n```jsx\n{REACT_STATE}\n/* {comment}```"
+
+def escaped_string_response(repeats: int = 2400) -> str:
+    """A 100 KB string literal full of escaped quotes, and a "return" in it, before the state and JSX"""
+    notice = 'Press \\"return\\" to add it to the \\"cart\\" ' * repeats
+    return f'Here you go:\n\n```jsx\nconst notice = "{notice}";\n{REACT_STATE}\n\n{REACT_JSX}\n```'
+
+def many_fences_response(blocks: int = 300) -> str:
+    """A response that interleaves many short fenced snippets with prose"""
+    return "\n".join(f"Step {i}:\n```jsx\nconst [v{i}, setV{i}] = useState({i});\n```" for i in range(blocks))
+
+def prose_heavy_code(lines: int = 2000) -> str:
+    """Code preceded and interleaved by many lines of explanatory prose"""
+    prose = "\n".join(f"This paragraph {i} explains what the component does in plain words" for i in range(lines))
+    return f"{prose}\n{REACT_STATE}\n{prose}"
+
+def large_ts_project(copies: int = 60) -> str:
+    return TS_PROJECT * copies
+
+def unterminated_interfaces(count: int = 1500) -> str:
+    """Many 'interface' keywords and no closing brace: worst case for lazy DOTALL matching"""
+    return "interface Broken " * count
+
+def unterminated_components(count: int = 1500) -> str:
+    """Many 'const x =' declarations and no '});' terminator"""
+    return "".join(f"const c{i} = () => {{ return null; " for i in range(count))
+
+def ui_document(components: int) -> Dict[str, Any]:
+    """A flat UI document with a mix of every leaf component type"""
+    kinds: List[Dict[str, Any]] = [
+        {"type": "heading", "props": {"text": "Welcome", "level": 2, "className": "title"}},
+        {"type": "text", "props": {"text": "Lorem ipsum dolor sit amet", "style": {"color": "#333"}}},
+        {"type": "button", "props": {"text": "Sign up", "id": "cta", "disabled": False}},
+        {"type": "input", "props": {"id": "email", "label": "Email", "type": "email", "placeholder": "you@example.com", "required": True}},
+        {"type": "image", "props": {"src": "https://example.com/a.png", "alt": "Hero", "objectFit": "contain"}}
+    ]
+    return {
+        "ui_components": [kinds[i % len(kinds)] for i in range(components)],
+        "layout": {"type": "grid", "props": {"columns": "repeat(3, 1fr)", "spacing": "1rem"}},
+        "design_tokens": {
+            "colors": {"primary": "#0066FF", "text": "#111111", "background": "#FFFFFF", "border": "#E2E8F0"},
+            "typography": {"fontFamily": "Inter, sans-serif", "fontSize": {"base": "16px"}, "lineHeight": {"normal": "1.5"}},
+            "spacing": {"sm": "0.5rem", "md": "1rem", "lg": "1.5rem"}
+        }
+    }
+
+def _card(i: int) -> Dict[str, Any]:
+    return {
+        "type": "card",
+        "props": {"className": "item"},
+        "children": [
+            {"type": "heading", "props": {"text": f"Item {i}", "level": 3}},
+            {"type": "text", "props": {"text": "Lorem ipsum dolor sit amet", "style": {"color": "#333"}}},
+            {"type": "button", "props": {"text": "Add to cart", "id": f"add-{i}"}}
+        ]
+    }
+
+def wide_ui_document(nodes: int, distinct: int = 50) -> Dict[str, Any]:
+    """A navbar and a grid of cards, nodes in all; only distinct cards differ, as in a list of items"""
+    document = ui_document(0)
+    cards = [_card(i % distinct) for i in range(max(0, nodes - 3) // 4)]
+    document["ui_components"] = [
+        {"type": "navbar", "props": {}, "children": [{"type": "heading", "props": {"text": "Shop", "level": 1}}]},
+        {"type": "grid", "props": {"columns": "repeat(4, 1fr)"}, "children": cards}
+    ]
+    return document
+
+def nested_ui_document(depth: int) -> Dict[str, Any]:
+    """Containers nested depth levels deep, each with a heading, a card and the next level"""
+    kinds = ("container", "card", "form", "grid")
+    node: Dict[str, Any] = {"type": "text", "props": {"text": "Innermost"}}
+    for level in range(depth, 0, -1):
+        node = {
+            "type": kinds[level % len(kinds)],
+            "props": {"id": f"level-{level}"},
+            "children": [{"type": "heading", "props": {"text": f"Level {level}", "level": 2}}, _card(level), node]
+        }
+    document = ui_document(0)
+    document["ui_components"] = [node]
+    return document
@@ -0,0 +1,108 @@
+"""
+Read/write throughput of the SQLite design store under concurrent worker processes.
+
+Each worker process opens its own SQLiteDesignStore on a shared database file,
+mirroring `uvicorn --workers N`. Run from the repository root:
+
+    python -m benchmarks.design_store_bench --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from app.services.design_store import MemoryDesignStore, SQLiteDesignStore
+
+SAMPLE_CODE = """const [items, setItems] = useState([
+  { id: 1, name: "Item 1", price: 10.99 },
+  { id: 2, name: "Item 2", price: 20.50 }
+]);
+
+return (
+  <div className="p-4 bg-white dark:bg-gray-900">
+    {items.map(item => (
+      <div key={item.id} className="mt-2 flex justify-between">
+        <span>{item.name}</span><span>${item.price}</span>
+      </div>
+    ))}
+  </div>
+);
+""" * 8
+
+def _write_worker(path: str, count: int, result_queue) -> None:
+    store = SQLiteDesignStore(path)
+    ids = [uuid.uuid4().hex[:8] for _ in range(count)]
+    start = time.perf_counter()
+    for design_id in ids:
+        store.put(design_id, SAMPLE_CODE, "react-tailwind")
+    result_queue.put((time.perf_counter() - start, ids))
+
+def _read_worker(path: str, ids: list, count: int, result_queue) -> None:
+    store = SQLiteDesignStore(path)
+    rng = random.Random(os.getpid())
+    start = time.perf_counter()
+    missing = 0
+    for _ in range(count):
+        if store.get(rng.choice(ids)) is None:
+            missing += 1
+    result_queue.put((time.perf_counter() - start, missing))
+
+def _run(target, args_list):
+    result_queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=(*args, result_queue)) for args in args_list]
+    for process in processes:
+        process.start()
+    results = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    # Throughput is measured over the slowest worker's timed loop, excluding process startup
+    return max(elapsed for elapsed, _ in results), results
+
+def bench_sqlite(workers: int, writes: int, reads: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "designs.sqlite3")
+        SQLiteDesignStore(path)
+
+        write_wall, write_results = _run(_write_worker, [(path, writes)] * workers)
+        ids = [design_id for _, worker_ids in write_results for design_id in worker_ids]
+
+        # Every reader samples ids written by all workers, so most reads are cross-process
+        read_wall, read_results = _run(_read_worker, [(path, ids, reads)] * workers)
+        missing = sum(result for _, result in read_results)
+
+        print(
+            f"sqlite  workers={workers:<2} "
+            f"writes/s={workers * writes / write_wall:>9.0f}  "
+            f"reads/s={workers * reads / read_wall:>9.0f}  "
+            f"missing={missing}"
+        )
+
+def bench_memory(writes: int, reads: int) -> None:
+    store = MemoryDesignStore()
+    ids = [uuid.uuid4().hex[:8] for _ in range(writes)]
+    start = time.perf_counter()
+    for design_id in ids:
+        store.put(design_id, SAMPLE_CODE, "react-tailwind")
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(reads):
+        store.get(random.choice(ids))
+    read_time = time.perf_counter() - start
+    print(f"memory  workers=1  writes/s={writes / write_time:>9.0f}  reads/s={reads / read_time:>9.0f}  (single process only)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writes", type=int, default=2000, help="writes per worker")
+    parser.add_argument("--reads", type=int, default=10000, help="reads per worker")
+    args = parser.parse_args()
+
+    bench_memory(args.writes, args.reads)
+    for workers in args.workers:
+        bench_sqlite(workers, args.writes, args.reads)
+
+if __name__ == "__main__":
+    main()
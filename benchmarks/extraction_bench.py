@@ -0,0 +1,197 @@
+"""
+Compares CodeExtractor with the split/regex extraction it replaced.
+
+Checks that both produce identical previews and cleaned code on the corpus, and that
+on responses with more than one return only the intended difference remains, then
+reports the per-call time of each and how the new extractor scales with response
+size. Run from the repository root:
+
+    python -m benchmarks.extraction_bench
+"""
+import os
+import re
+import time
+from typing import Callable, Tuple
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from app.services.ai_service import AIService
+from app.services.code_extractor import CodeExtractor
+from app.services.stack_profiles import get_stack_profile
+from benchmarks import corpus
+
+def legacy_clean_react_code(code: str, strip_prose: bool = True) -> str:
+    """AIService._clean_react_code before CodeExtractor"""
+    code_start = code.find('const') if strip_prose else -1
+    if code_start != -1:
+        code = code[code_start:]
+
+    lines = code.split('\n')
+    cleaned_lines = []
+    in_code_block = False
+    code_starters = ('const ', 'let ', 'return ', 'function ', 'if ', 'for ', '{')
+
+    for line in lines:
+        if not line.strip():
+            continue
+        if any(line.strip().startswith(starter) for starter in code_starters):
+            in_code_block = True
+        elif line.strip().startswith(('<', '}')) or '/>' in line or '>' in line:
+            in_code_block = True
+        if not in_code_block or not line.strip():
+            continue
+        cleaned_lines.append(line.rstrip())
+
+    code = '\n'.join(cleaned_lines)
+    code = re.sub(r'React\.useState', 'useState', code)
+    code = re.sub(r'React:\s*"useState"', 'useState', code)
+    code = re.sub(r'React:\s*useState', 'useState', code)
+    code = re.sub(r':\s*"(\d+(?:\.\d+)?)"', r': \1', code)
+    code = re.sub(r'"(\d+):\s*(\d+)"', r'\1.\2', code)
+    code = re.sub(r'let \w+Component\s*=\s*\(\)\s*=>\s*{', '', code)
+    code = re.sub(r'const \w+Component\s*=\s*\(\)\s*=>\s*{', '', code)
+    code = code.strip()
+
+    if code.startswith('return'):
+        if not code.startswith('return ('):
+            code = re.sub(r'^return\s*', 'return (', code)
+            if code.endswith(';'):
+                code = code[:-1] + ');'
+            else:
+                code += ')'
+
+    if code and not any(code.rstrip().endswith(x) for x in [';', '}', '>', '/>']):
+        code += ';'
+    return code
+
+def legacy_build_preview(generated_code: str, tech_stack: str, whole_tail: bool = False) -> Tuple[str, str]:
+    """
+    AIService._build_preview before CodeExtractor.
+
+    With whole_tail, the JSX is everything after the first return, as CodeExtractor
+    takes it, rather than the text up to the second return, and is cleaned without
+    stripping prose up to a 'const' inside it.
+    """
+    template = get_stack_profile(tech_stack).template
+    if "```" in generated_code:
+        generated_code = generated_code.split("```")[1]
+        if generated_code.startswith(("jsx", "tsx", "html", "javascript")):
+            generated_code = generated_code[generated_code.index("\n")+1:]
+        if generated_code.endswith("```"):
+            generated_code = generated_code[:-3]
+
+    if tech_stack == "react-tailwind":
+        code_parts = generated_code.split("return", 1 if whole_tail else -1)
+        if len(code_parts) > 1:
+            state_code = legacy_clean_react_code(code_parts[0].strip())
+            jsx_code = legacy_clean_react_code('return ' + code_parts[1].strip(), strip_prose=not whole_tail)
+            preview_html = template.replace("// Generated state declarations will be inserted here", state_code)
+            preview_html = preview_html.replace("{/* Generated UI code will be inserted here */}", jsx_code)
+        else:
+            cleaned_code = legacy_clean_react_code(generated_code.strip())
+            if not cleaned_code.startswith('return'):
+                cleaned_code = 'return (' + cleaned_code + ')'
+            preview_html = template.replace("{/* Generated UI code will be inserted here */}", cleaned_code)
+    else:
+        preview_html = template.replace("<!-- Your HTML code will be inserted here -->", generated_code.strip())
+    return preview_html, generated_code
+
+def _best_time(fn: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> float:
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+def check_identical() -> int:
+    """Number of corpus inputs where the new and legacy outputs differ"""
+    previews = [
+        ("react", corpus.REACT_RESPONSE, "react-tailwind"),
+        ("html", corpus.HTML_RESPONSE, "html-tailwind"),
+        ("react_in_html_stack", corpus.REACT_RESPONSE, "html-tailwind"),
+        ("large_100kb", corpus.large_response(), "react-tailwind")
+    ]
+    cleans = [
+        ("state", corpus.REACT_STATE),
+        ("jsx", corpus.REACT_JSX),
+        ("large_100kb", corpus.large_jsx()),
+        ("nested_500", corpus.nested_jsx()),
+        ("prose_heavy", corpus.prose_heavy_code())
+    ]
+
+    # Inputs where CodeExtractor deliberately keeps the JSX after a second return
+    multi_return = [
+        ("effect_cleanup", corpus.REACT_EFFECT_RESPONSE),
+        ("map_callback", corpus.REACT_MAP_RETURN_RESPONSE),
+        ("helper_function", corpus.REACT_HELPER_RESPONSE)
+    ]
+
+    mismatches = 0
+    for name, response, tech_stack in previews:
+        if AIService._build_preview(response, tech_stack) != legacy_build_preview(response, tech_stack):
+            print(f"MISMATCH build_preview/{name}")
+            mismatches += 1
+    for name, code in cleans:
+        if CodeExtractor.clean_react_code(code) != legacy_clean_react_code(code):
+            print(f"MISMATCH clean_react_code/{name}")
+            mismatches += 1
+    print(f"Identical output on {len(previews) + len(cleans) - mismatches}/{len(previews) + len(cleans)} corpus inputs")
+
+    differing = 0
+    for name, response in multi_return:
+        preview = AIService._build_preview(response, "react-tailwind")
+        if preview != legacy_build_preview(response, "react-tailwind", whole_tail=True):
+            print(f"MISMATCH build_preview/{name} against the whole-tail split")
+            mismatches += 1
+        elif preview != legacy_build_preview(response, "react-tailwind"):
+            differing += 1
+    print(f"Multi-return inputs: JSX runs to the end on {len(multi_return)}, "
+          f"{differing} of which differ from split('return')[1]")
+    return mismatches
+
+def main() -> None:
+    mismatches = check_identical()
+    large_jsx = corpus.large_jsx()
+    prose = corpus.prose_heavy_code()
+    large_response = corpus.large_response()
+    many_fences = corpus.many_fences_response()
+
+    print(f"\n{'case':<32} {'legacy':>12} {'new':>12} {'speedup':>8}")
+    cases = [
+        ("clean_react_code/jsx", lambda: legacy_clean_react_code(corpus.REACT_JSX), lambda: CodeExtractor.clean_react_code(corpus.REACT_JSX)),
+        ("clean_react_code/large_100kb", lambda: legacy_clean_react_code(large_jsx), lambda: CodeExtractor.clean_react_code(large_jsx)),
+        ("clean_react_code/prose_heavy", lambda: legacy_clean_react_code(prose), lambda: CodeExtractor.clean_react_code(prose)),
+        ("build_preview/react", lambda: legacy_build_preview(corpus.REACT_RESPONSE, "react-tailwind"), lambda: AIService._build_preview(corpus.REACT_RESPONSE, "react-tailwind")),
+        ("build_preview/large_100kb", lambda: legacy_build_preview(large_response, "react-tailwind"), lambda: AIService._build_preview(large_response, "react-tailwind")),
+        ("build_preview/many_fences", lambda: legacy_build_preview(many_fences, "react-tailwind"), lambda: AIService._build_preview(many_fences, "react-tailwind"))
+    ]
+    for name, legacy, new in cases:
+        legacy_time = _best_time(legacy)
+        new_time = _best_time(new)
+        print(f"{name:<32} {legacy_time * 1e6:>10.1f}us {new_time * 1e6:>10.1f}us {legacy_time / new_time:>7.2f}x")
+
+    # Doubling the response should roughly double the time
+    print(f"\n{'response size':<32} {'time':>12} {'us/KB':>8}")
+    for rows in (1500, 3000, 6000):
+        response = f"Here you go:\n\n```jsx\n{corpus.REACT_STATE}\n\n{corpus.large_jsx(rows)}\n```\nEnjoy!"
+        elapsed = _best_time(lambda: AIService._build_preview(response, "react-tailwind"))
+        size_kb = len(response) / 1024
+        print(f"{size_kb:>10.0f} KB{'':<19} {elapsed * 1e6:>10.1f}us {elapsed * 1e6 / size_kb:>8.2f}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
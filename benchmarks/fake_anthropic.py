@@ -0,0 +1,207 @@
+"""
+Local stand-in for the Anthropic Messages API.
+
+Serves POST /v1/messages, both blocking and streaming (server-sent events), with
+configurable time to first token, output token rate, error injection and occasional
+slow responses (to exercise request hedging). Point the
+app at it with ANTHROPIC_BASE_URL:
+
+    python -m benchmarks.fake_anthropic --port 9100 --latency 0.5 --tokens-per-second 200
+    ANTHROPIC_BASE_URL=http://127.0.0.1:9100 ANTHROPIC_API_KEY=fake python -m uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REACT_RESPONSE = '''Here is the UI you asked for:
+
+```jsx
+const [tasks, setTasks] = useState([
+  { id: 1, title: "Write report", done: false, estimate: "2.5" },
+  { id: 2, title: "Review PR", done: true, estimate: "1" }
+]);
+const [filter, setFilter] = useState("all");
+
+return (
+  <div className="max-w-2xl mx-auto p-6 bg-white dark:bg-gray-800 rounded-lg shadow">
+    <h1 className="text-2xl font-bold mb-4">Tasks</h1>
+    <div className="flex gap-2 mb-4">
+      {["all", "open", "done"].map(f => (
+        <button key={f} onClick={() => setFilter(f)} className="px-3 py-1 rounded bg-blue-500 text-white">{f}</button>
+      ))}
+    </div>
+    <ul>
+      {tasks.map(task => (
+        <li key={task.id} className="flex justify-between py-2 border-b">
+          <span>{task.title}</span>
+          <span>{task.estimate}h</span>
+        </li>
+      ))}
+    </ul>
+  </div>
+);
+```
+
+Let me know if you want any changes.'''
+
+HTML_RESPONSE = '''```html
+<header class="bg-white dark:bg-gray-800 shadow">
+  <nav class="max-w-7xl mx-auto px-4 py-4 flex justify-between" aria-label="Main">
+    <a href="#" class="text-xl font-bold">FitTrack</a>
+    <button onclick="toggleDarkMode()" class="px-3 py-1 rounded border">Toggle theme</button>
+  </nav>
+</header>
+<main class="max-w-7xl mx-auto px-4 py-12 grid md:grid-cols-3 gap-6">
+  <section class="p-6 rounded-lg bg-white dark:bg-gray-800 shadow">
+    <h2 class="text-lg font-semibold">Workouts</h2>
+    <p class="text-gray-600 dark:text-gray-300">Plan and track your sessions.</p>
+  </section>
+  <section class="p-6 rounded-lg bg-white dark:bg-gray-800 shadow">
+    <h2 class="text-lg font-semibold">Nutrition</h2>
+    <p class="text-gray-600 dark:text-gray-300">Log meals and macros.</p>
+  </section>
+  <section class="p-6 rounded-lg bg-white dark:bg-gray-800 shadow">
+    <h2 class="text-lg font-semibold">Progress</h2>
+    <img src="https://images.unsplash.com/photo-1517836357463-d25dfeac3438" alt="Progress chart" class="rounded mt-4">
+  </section>
+</main>
+```'''
+
+# Rough characters-per-token ratio used to pace streamed output
+CHARS_PER_TOKEN = 4
+# Shortest system prompt, in tokens, that the real API will cache
+MIN_CACHEABLE_TOKENS = 1024
+
+def create_app(
+    latency: float,
+    tokens_per_second: float,
+    error_rate: float,
+    error_status: int,
+    slow_rate: float = 0.0,
+    slow_latency: float = 10.0
+) -> FastAPI:
+    app = FastAPI(title="Fake Anthropic Messages API")
+    stats = {"requests": 0, "streams": 0, "errors": 0, "slow": 0}
+    cached_prefixes = set()
+
+    def _response_text(body: dict) -> str:
+        system = body.get("system", "")
+        if isinstance(system, list):
+            system = " ".join(block.get("text", "") for block in system)
+        return REACT_RESPONSE if "React component" in system else HTML_RESPONSE
+
+    def _usage(body: dict, text: str) -> dict:
+        input_tokens = len(json.dumps(body)) // CHARS_PER_TOKEN
+        cache_read = cache_write = 0
+
+        # Emulate prompt caching of a system prompt ending in a cache_control breakpoint
+        system = body.get("system")
+        if isinstance(system, list) and system and system[-1].get("cache_control"):
+            prefix = json.dumps(system)
+            prefix_tokens = len(prefix) // CHARS_PER_TOKEN
+            if prefix_tokens >= MIN_CACHEABLE_TOKENS:
+                if prefix in cached_prefixes:
+                    cache_read = prefix_tokens
+                else:
+                    cached_prefixes.add(prefix)
+                    cache_write = prefix_tokens
+                input_tokens -= prefix_tokens
+
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": len(text) // CHARS_PER_TOKEN,
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read
+        }
+
+    def _error_response() -> JSONResponse:
+        stats["errors"] += 1
+        error_type = "rate_limit_error" if error_status == 429 else "overloaded_error"
+        return JSONResponse(
+            status_code=error_status,
+            content={"type": "error", "error": {"type": error_type, "message": "Injected error"}},
+            headers={"retry-after": "1"}
+        )
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if random.random() < error_rate:
+            return _error_response()
+
+        text = _response_text(body)
+        usage = _usage(body, text)
+        generation_time = len(text) / CHARS_PER_TOKEN / tokens_per_second
+        first_token_latency = latency
+        if random.random() < slow_rate:
+            stats["slow"] += 1
+            first_token_latency = slow_latency
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_latency + generation_time)
+            return {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": body["model"],
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": usage
+            }
+
+        stats["streams"] += 1
+
+        async def event_stream():
+            def event(name: str, data: dict) -> str:
+                return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+            await asyncio.sleep(first_token_latency)
+            yield event("message_start", {"type": "message_start", "message": {
+                "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": body["model"],
+                "content": [], "stop_reason": None, "stop_sequence": None, "usage": {**usage, "output_tokens": 0}
+            }})
+            yield event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+            step = CHARS_PER_TOKEN
+            delay = 1 / tokens_per_second
+            for i in range(0, len(text), step):
+                yield event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text[i:i + step]}})
+                await asyncio.sleep(delay)
+            yield event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": usage["output_tokens"]}})
+            yield event("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats() -> dict:
+        return stats
+
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="output token rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=529, help="HTTP status of injected errors (429 or 529)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests with a slow first token")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="seconds before the first token of a slow request")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency, args.tokens_per_second, args.error_rate, args.error_status, args.slow_rate, args.slow_latency
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Microbenchmarks for the pure-Python hot paths run on every request:
+AIService._clean_react_code, AIService._build_preview (code extraction),
+StreamingCodeParser fed in streamed deltas, HTMLRenderer.generate_html / iter_html, IncrementalRenderer.rerender and
+FileService.create_react_project.
+
+Every case reports the best per-call time and the peak memory allocated during
+one call, and is checked against benchmarks/hot_paths_thresholds.json; the run
+exits non-zero when any case exceeds its threshold. Run from the repository root:
+
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --filter clean_react_code
+    python -m benchmarks.hot_paths --write-thresholds --headroom 3
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from app.services.ai_service import AIService
+from app.services.file_service import FileService
+from app.services.incremental_renderer import IncrementalRenderer
+from app.services.renderer import HTMLRenderer
+from app.services.stack_profiles import get_stack_profile
+from benchmarks import corpus
+
+THRESHOLDS_PATH = Path(__file__).parent / "hot_paths_thresholds.json"
+# Roughly one streamed text delta, as in stream_parser_bench
+DELTA_CHARS = 16
+
+def _stream(deltas: List[str]) -> str:
+    """Feed deltas to a React stream parser and finish it"""
+    parser = get_stack_profile("react-tailwind").create_stream_parser()
+    for delta in deltas:
+        parser.feed(delta)
+    parser.finish()
+    return parser.code
+
+def _deltas(text: str) -> List[str]:
+    return [text[i:i + DELTA_CHARS] for i in range(0, len(text), DELTA_CHARS)]
+
+def _cases() -> List[Tuple[str, Callable[[], object]]]:
+    large_jsx = corpus.large_jsx()
+    nested_jsx = corpus.nested_jsx()
+    prose_code = corpus.prose_heavy_code()
+    large_response = corpus.large_response()
+    unterminated_response = corpus.unterminated_response()
+    many_fences = corpus.many_fences_response()
+    unclosed_comment = _deltas(corpus.unclosed_comment_response())
+    escaped_string = _deltas(corpus.escaped_string_response())
+    large_project = corpus.large_ts_project()
+    broken_interfaces = corpus.unterminated_interfaces()
+    broken_components = corpus.unterminated_components()
+    small_document = corpus.ui_document(10)
+    large_document = corpus.ui_document(1000)
+    huge_document = corpus.ui_document(10000)
+    deep_tree = corpus.nested_ui_document(50)
+    wide_tree = corpus.wide_ui_document(10000)
+    rendered_tree = IncrementalRenderer.render(copy.deepcopy(wide_tree))
+    edited_tree = copy.deepcopy(wide_tree)
+    edited_tree["ui_components"][1]["children"][1000]["children"][0]["props"]["text"] = "Edited"
+
+    return [
+        ("clean_react_code/state", lambda: AIService._clean_react_code(corpus.REACT_STATE)),
+        ("clean_react_code/jsx", lambda: AIService._clean_react_code(corpus.REACT_JSX)),
+        ("clean_react_code/large_100kb", lambda: AIService._clean_react_code(large_jsx)),
+        ("clean_react_code/nested_500", lambda: AIService._clean_react_code(nested_jsx)),
+        ("clean_react_code/prose_heavy", lambda: AIService._clean_react_code(prose_code)),
+        ("build_preview/react", lambda: AIService._build_preview(corpus.REACT_RESPONSE, "react-tailwind")),
+        ("build_preview/html", lambda: AIService._build_preview(corpus.HTML_RESPONSE, "html-tailwind")),
+        ("build_preview/large_100kb", lambda: AIService._build_preview(large_response, "react-tailwind")),
+        ("build_preview/unterminated", lambda: AIService._build_preview(unterminated_response, "react-tailwind")),
+        ("build_preview/many_fences", lambda: AIService._build_preview(many_fences, "react-tailwind")),
+        # A token left open across thousands of deltas must not be rescanned for each
+        ("stream_parser/unclosed_comment_100kb", lambda: _stream(unclosed_comment)),
+        ("stream_parser/escaped_string_100kb", lambda: _stream(escaped_string)),
+        ("generate_html/10_components", lambda: HTMLRenderer.generate_html(small_document)),
+        ("generate_html/1000_components", lambda: HTMLRenderer.generate_html(large_document)),
+        ("generate_html/tree_50_deep", lambda: HTMLRenderer.generate_html(deep_tree)),
+        ("generate_html/tree_10k_wide", lambda: HTMLRenderer.generate_html(wide_tree)),
+        ("rerender/tree_10k_wide_one_edit", lambda: IncrementalRenderer.rerender(rendered_tree, edited_tree)),
+        # Streamed one chunk at a time, peak memory must not grow with the document
+        ("iter_html/1000_components", lambda: sum(len(chunk) for chunk in HTMLRenderer.iter_html(large_document))),
+        ("iter_html/10000_components", lambda: sum(len(chunk) for chunk in HTMLRenderer.iter_html(huge_document))),
+        ("create_react_project/realistic", lambda: FileService.create_react_project(corpus.TS_PROJECT)),
+        ("create_react_project/large", lambda: FileService.create_react_project(large_project)),
+        ("create_react_project/unterminated_interfaces", lambda: FileService.create_react_project(broken_interfaces)),
+        ("create_react_project/unterminated_components", lambda: FileService.create_react_project(broken_components))
+    ]
+
+def _time_per_call(fn: Callable[[], object], min_time: float, repeat: int) -> float:
+    """Best per-call time over several timed batches, timeit-style"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+def _peak_allocation(fn: Callable[[], object]) -> int:
+    """Peak bytes allocated while running fn once"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+def run(filter_text: str, min_time: float, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, fn in _cases():
+        if filter_text and filter_text not in name:
+            continue
+        # Keep anything a case prints out of the report (but not out of the timing)
+        with contextlib.redirect_stdout(io.StringIO()) as sink:
+            fn()
+            per_call = _time_per_call(lambda: (fn(), sink.seek(0), sink.truncate()), min_time, repeat)
+            peak = _peak_allocation(fn)
+        results[name] = {"time_us": per_call * 1e6, "peak_kib": peak / 1024}
+    return results
+
+def check(results: Dict[str, Dict[str, float]], thresholds: Dict[str, Dict[str, float]]) -> List[str]:
+    failures = []
+    for name, result in results.items():
+        limit = thresholds.get(name)
+        if limit is None:
+            continue
+        if result["time_us"] > limit["max_time_us"]:
+            failures.append(f"{name}: {result['time_us']:.1f}us exceeds {limit['max_time_us']:.1f}us")
+        if result["peak_kib"] > limit["max_peak_kib"]:
+            failures.append(f"{name}: {result['peak_kib']:.1f}KiB exceeds {limit['max_peak_kib']:.1f}KiB")
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per timed batch")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--thresholds", default=str(THRESHOLDS_PATH))
+    parser.add_argument("--write-thresholds", action="store_true", help="record the current results as thresholds")
+    parser.add_argument("--headroom", type=float, default=3.0, help="multiplier applied when writing thresholds")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.min_time, args.repeat)
+
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+
+    for name, result in results.items():
+        limit = thresholds.get(name)
+        limit_text = f"  (limit {limit['max_time_us']:.1f}us / {limit['max_peak_kib']:.1f}KiB)" if limit else ""
+        print(f"{name:<48} {result['time_us']:>12.1f}us  peak={result['peak_kib']:>10.1f}KiB{limit_text}")
+
+    if args.write_thresholds:
+        for name, result in results.items():
+            thresholds[name] = {
+                "max_time_us": round(result["time_us"] * args.headroom, 1),
+                "max_peak_kib": round(max(result["peak_kib"], 1.0) * args.headroom, 1)
+            }
+        with open(args.thresholds, "w") as f:
+            json.dump(thresholds, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote thresholds to {args.thresholds}")
+        return
+
+    failures = check(results, thresholds)
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
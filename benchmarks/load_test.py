@@ -0,0 +1,201 @@
+"""
+Load test for the FastAPI app against a local fake Anthropic server.
+
+Starts benchmarks.fake_anthropic and app.main:app as subprocesses, then drives
+/api/generate followed by /api/download/{design_id} at increasing concurrency. Each
+level reports requests per second, p50/p95/p99 latency, error counts and the app's
+resident memory growth. Run from the repository root:
+
+    python -m benchmarks.load_test --concurrency 1 4 16 64 --duration 20
+    python -m benchmarks.load_test --latency 2 --tokens-per-second 80 --error-rate 0.05 --json results.json
+    CLAUDE_HEDGING=1 python -m benchmarks.load_test --concurrency 4 --slow-rate 0.05 --slow-latency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MiB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+async def _wait_until_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+class LevelResult:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.latencies: Dict[str, List[float]] = {"generate": [], "download": []}
+        self.errors: Dict[str, int] = {"generate": 0, "download": 0}
+        self.elapsed = 0.0
+        self.rss_before: Optional[float] = None
+        self.rss_after: Optional[float] = None
+
+    def summary(self) -> dict:
+        result = {"concurrency": self.concurrency, "elapsed": round(self.elapsed, 3)}
+        for endpoint, samples in self.latencies.items():
+            result[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "rps": round(len(samples) / self.elapsed, 2) if self.elapsed else 0.0,
+                "mean_ms": round(statistics.mean(samples) * 1000, 1) if samples else 0.0,
+                "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 1)
+            }
+        if self.rss_before is not None and self.rss_after is not None:
+            result["rss_mb"] = round(self.rss_after, 1)
+            result["rss_growth_mb"] = round(self.rss_after - self.rss_before, 1)
+        return result
+
+async def _user(client: httpx.AsyncClient, args, result: LevelResult, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        # Unique prompts bypass the generation cache unless --repeat-prompts is given
+        prompt = "A task tracker" if args.repeat_prompts else f"A task tracker #{uuid.uuid4().hex}"
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/generate", json={"prompt": prompt, "tech_stack": args.tech_stack})
+            response.raise_for_status()
+            design_id = response.json()["design_id"]
+        except (httpx.HTTPError, KeyError, ValueError):
+            result.errors["generate"] += 1
+            continue
+        result.latencies["generate"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            response = await client.get(f"/api/download/{design_id}")
+            response.raise_for_status()
+        except httpx.HTTPError:
+            result.errors["download"] += 1
+            continue
+        result.latencies["download"].append(time.perf_counter() - start)
+
+async def run_level(base_url: str, app_pid: int, concurrency: int, args) -> LevelResult:
+    result = LevelResult(concurrency)
+    result.rss_before = _rss_mb(app_pid)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*[_user(client, args, result, deadline) for _ in range(concurrency)])
+        result.elapsed = time.monotonic() - start
+    result.rss_after = _rss_mb(app_pid)
+    return result
+
+def _print_result(result: LevelResult) -> None:
+    summary = result.summary()
+    memory = ""
+    if "rss_mb" in summary:
+        memory = f"  rss={summary['rss_mb']:.1f}MiB ({summary['rss_growth_mb']:+.1f})"
+    for endpoint in ("generate", "download"):
+        stats = summary[endpoint]
+        print(
+            f"c={result.concurrency:<4} {endpoint:<9} rps={stats['rps']:>8.2f}  "
+            f"p50={stats['p50_ms']:>8.1f}ms  p95={stats['p95_ms']:>8.1f}ms  p99={stats['p99_ms']:>8.1f}ms  "
+            f"errors={stats['errors']}" + (memory if endpoint == "generate" else "")
+        )
+
+async def main_async(args) -> List[dict]:
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    cache_dir = tempfile.mkdtemp(prefix="ui_generator_bench_")
+
+    env = {
+        **os.environ,
+        "ANTHROPIC_BASE_URL": fake_url,
+        "ANTHROPIC_API_KEY": "fake-key",
+        "GENERATION_CACHE_DIR": "" if not args.repeat_prompts else os.path.join(cache_dir, "generations"),
+        "DESIGN_STORE_PATH": os.path.join(cache_dir, "designs.sqlite3")
+    }
+    if args.workers > 1:
+        # Downloads may land on a different worker than the generation
+        env["DESIGN_STORE"] = "sqlite"
+    fake_cmd = [
+        sys.executable, "-m", "benchmarks.fake_anthropic", "--port", str(args.fake_port),
+        "--latency", str(args.latency), "--tokens-per-second", str(args.tokens_per_second),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+        "--slow-rate", str(args.slow_rate), "--slow-latency", str(args.slow_latency)
+    ]
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--log-level", "warning", "--workers", str(args.workers)
+    ]
+
+    fake = subprocess.Popen(fake_cmd, env=env)
+    app = subprocess.Popen(app_cmd, env=env)
+    try:
+        await _wait_until_ready(f"{fake_url}/stats")
+        await _wait_until_ready(f"{app_url}/api/cache/stats")
+
+        results = []
+        for concurrency in args.concurrency:
+            result = await run_level(app_url, app.pid, concurrency, args)
+            _print_result(result)
+            results.append(result.summary())
+        return results
+    finally:
+        for process in (app, fake):
+            process.terminate()
+        for process in (app, fake):
+            process.wait(timeout=10)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--tech-stack", default="react-tailwind")
+    parser.add_argument("--repeat-prompts", action="store_true", help="reuse one prompt so the generation cache is exercised")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the app")
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=9101)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="fake upstream output token rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests that fail")
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of upstream requests with a slow first token")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="fake upstream first-token seconds of a slow request")
+    parser.add_argument("--json", help="write the per-level summaries to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
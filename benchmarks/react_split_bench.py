@@ -0,0 +1,165 @@
+"""
+Routing and worst-case timing of the React project splitter against the regexes it
+replaced.
+
+Checks that create_react_project puts each part of realistic outputs (TypeScript
+projects, the React stack's state declarations and JSX, indented code) in the right
+file, keeps every interface the old patterns found, and that every relative import in
+the archive points at a file it contains. Then runs both on adversarial model outputs
+at doubling sizes. The old lazy-DOTALL
+patterns grow quadratically; the declaration scanner must stay linear, and the run
+exits non-zero if its cost per KB grows more than MAX_GROWTH times from the
+smallest to the largest input. Run from the repository root:
+
+    python -m benchmarks.react_split_bench
+"""
+import io
+import posixpath
+import re
+import sys
+import textwrap
+import time
+import zipfile
+from typing import Callable, Dict, List, Tuple
+
+from app.services.code_extractor import CodeExtractor
+from app.services.file_service import FileService
+from benchmarks import corpus
+
+SIZES = (500, 1000, 2000, 4000)
+# Allowed growth in per-KB cost between the smallest and largest input
+MAX_GROWTH = 3.0
+# The legacy patterns are skipped above this many seconds per call
+LEGACY_TIME_LIMIT = 2.0
+# Relative module specifiers in import statements of the generated sources
+RELATIVE_IMPORT = re.compile(r"^import\s[^;]*?'(\.{1,2}/[^']+)'", re.MULTILINE)
+# What tsc and the bundler try when a specifier has no extension
+RESOLVE_SUFFIXES = ("", ".ts", ".tsx", ".js", ".jsx", "/index.ts", "/index.tsx")
+
+def legacy_split(content: str) -> None:
+    """The regexes FileService.create_react_project used before the scanner"""
+    re.search(r'(interface.*?}\s*)+', content, re.DOTALL)
+    re.search(r'(const\s+\w+\s*=.*?}\);?\s*)+', content, re.DOTALL)
+    re.search(r'const\s+App\s*=.*?}\);?\s*', content, re.DOTALL)
+
+REACT_BODY = f"{corpus.REACT_STATE}\n\n{corpus.REACT_JSX}"
+
+# (name, code, {project file: snippets it must contain})
+ROUTING: List[Tuple[str, str, Dict[str, List[str]]]] = [
+    ("ts_project", corpus.TS_PROJECT, {
+        "src/types/interfaces.ts": ["interface Item {", "interface CartProps {"],
+        "src/components/Components.tsx": ["const ItemCard = ", "const Cart = "],
+        "src/App.tsx": ["const App = ", "<Cart items={items}"]
+    }),
+    ("indented_ts_project", textwrap.indent(corpus.TS_PROJECT, "    "), {
+        "src/types/interfaces.ts": ["interface Item {", "interface CartProps {"],
+        "src/components/Components.tsx": ["const ItemCard = ", "const Cart = "],
+        "src/App.tsx": ["const App = ", "<Cart items={items}"]
+    }),
+    ("state_and_jsx", REACT_BODY, {
+        "src/App.tsx": ["const App = () => {", "useState(0);", "Items in cart: {count}", "export default App;"]
+    }),
+    ("indented_state_and_jsx", textwrap.indent(REACT_BODY, "  "), {
+        "src/App.tsx": ["const App = () => {", "useState(0);", "Items in cart: {count}", "export default App;"]
+    }),
+    ("effect_cleanup", CodeExtractor.extract_code(corpus.REACT_EFFECT_RESPONSE), {
+        "src/App.tsx": ["return () => clearInterval(id);", "Elapsed: {seconds}s"]
+    }),
+    ("map_callback", CodeExtractor.extract_code(corpus.REACT_MAP_RETURN_RESPONSE), {
+        "src/App.tsx": ["const label = ", "<li key={item.id}>"]
+    })
+]
+
+def _project_files(code: str) -> Dict[str, str]:
+    archive = zipfile.ZipFile(io.BytesIO(FileService.create_react_project(code)[0]))
+    return {name: archive.read(name).decode("utf-8") for name in archive.namelist()}
+
+def _normalized(text: str) -> str:
+    return " ".join(text.split())
+
+def _unresolved_imports(files: Dict[str, str]) -> List[str]:
+    """Relative imports in the archive that do not point at a file in it"""
+    unresolved = []
+    for path, text in files.items():
+        if not path.endswith((".ts", ".tsx", ".js", ".jsx")):
+            continue
+        for specifier in RELATIVE_IMPORT.findall(text):
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(path), specifier))
+            if not any(target + suffix in files for suffix in RESOLVE_SUFFIXES):
+                unresolved.append(f"{path}: {specifier!r}")
+    return unresolved
+
+def check_routing() -> int:
+    """Number of inputs where a project file is missing code it should hold or imports a missing file"""
+    failures = 0
+    for name, code, expected in ROUTING:
+        files = _project_files(code)
+        unresolved = _unresolved_imports(files)
+        if unresolved:
+            print(f"UNRESOLVED IMPORTS {name}: {'; '.join(unresolved)}")
+        missing = [
+            f"{path}: {snippet!r}" for path, snippets in expected.items()
+            for snippet in snippets if snippet not in files.get(path, "")
+        ]
+        # Whatever the old interface pattern found must still be there
+        legacy = re.search(r'(interface.*?}\s*)+', code, re.DOTALL)
+        if legacy and _normalized(legacy.group()) not in _normalized(files.get("src/types/interfaces.ts", "")):
+            missing.append("src/types/interfaces.ts: interfaces found by the old pattern")
+        if missing:
+            print(f"MISROUTED {name}: {'; '.join(missing)}")
+        if missing or unresolved:
+            failures += 1
+    print(f"Routing correct on {len(ROUTING) - failures}/{len(ROUTING)} inputs\n")
+    return failures
+
+INPUTS: Dict[str, Callable[[int], str]] = {
+    "unterminated_interfaces": corpus.unterminated_interfaces,
+    "unterminated_components": corpus.unterminated_components,
+    "unclosed_comment": lambda n: "const a = 1;\n/* " + "interface X { } const b = () => {});\n" * n,
+    "unclosed_template": lambda n: "const a = `" + "${x} { ( [ " * n,
+    "deep_nesting": lambda n: "const App = () => " + "{ (" * n + "<div/>" + ") }" * n + ";\n",
+    "realistic_project": lambda n: corpus.large_ts_project(max(1, n // 20))
+}
+
+def _time(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    best = time.perf_counter() - start
+    if best > 0.2:
+        return best
+    for _ in range(4):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    misrouted = check_routing()
+    failures = []
+    print(f"{'input':<26} {'size':>9} {'legacy':>12} {'scanner':>12} {'scanner us/KB':>14}")
+    for name, build in INPUTS.items():
+        per_kb = []
+        skip_legacy = False
+        for size in SIZES:
+            content = build(size)
+            size_kb = len(content) / 1024
+            legacy_text = "skipped"
+            if not skip_legacy:
+                legacy_time = _time(lambda: legacy_split(content))
+                legacy_text = f"{legacy_time * 1000:.1f}ms"
+                skip_legacy = legacy_time > LEGACY_TIME_LIMIT
+            scanner_time = _time(lambda: CodeExtractor.split_declarations(content))
+            per_kb.append(scanner_time * 1e6 / size_kb)
+            print(f"{name:<26} {size_kb:>7.0f}KB {legacy_text:>12} {scanner_time * 1000:>10.2f}ms {per_kb[-1]:>14.2f}")
+        if per_kb[-1] > per_kb[0] * MAX_GROWTH:
+            failures.append(f"{name}: {per_kb[0]:.2f}us/KB grew to {per_kb[-1]:.2f}us/KB")
+
+    if failures:
+        print("\nNon-linear scanner cost:")
+        for failure in failures:
+            print(f"  {failure}")
+    if failures or misrouted:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Compares the compiled HTMLRenderer with the f-string renderer it replaced.
+
+Checks that both produce identical pages, and that the streaming renderer's chunks
+join to the same page, then reports render time and throughput (components per
+second) on 1k-10k component documents and peak memory of building the page versus
+streaming it. Run from the repository root:
+
+    python -m benchmarks.renderer_bench
+"""
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from app.services.renderer import HTMLRenderer
+from benchmarks import corpus
+
+SIZES = (1000, 2000, 5000, 10000)
+MEMORY_SIZES = (1000, 10000, 50000)
+
+class LegacyHTMLRenderer:
+    """HTMLRenderer before compilation: debug dumps on every render and string +="""
+
+    @staticmethod
+    def generate_html(ui_data: Dict[str, Any]) -> str:
+        print(f"[Renderer] Starting HTML generation")
+        components = ui_data.get("ui_components", [])
+        layout = ui_data.get("layout", {})
+        design_tokens = ui_data.get("design_tokens", {})
+        print(f"[Renderer] Components: {json.dumps(components, indent=2)}")
+        print(f"[Renderer] Layout: {json.dumps(layout, indent=2)}")
+
+        print(f"[Renderer] Generating CSS from design tokens")
+        css = HTMLRenderer._generate_css(design_tokens)
+        print(f"[Renderer] Successfully generated CSS")
+
+        components_html = ""
+        for component in components:
+            try:
+                component_html = LegacyHTMLRenderer._render_component(component)
+                components_html += component_html
+            except Exception as e:
+                print(f"[Renderer] Error rendering component: {str(e)}")
+                print(f"[Renderer] Component data: {json.dumps(component, indent=2)}")
+                continue
+
+        layout_html = LegacyHTMLRenderer._render_layout(layout, components_html)
+        html = f"""
+            <!DOCTYPE html>
+            <html lang="en">
+            <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>UI Preview</title>
+                <style>
+                    {css}
+                </style>
+            </head>
+            <body>
+                {layout_html}
+            </body>
+            </html>
+            """
+        print(f"[Renderer] Successfully generated HTML")
+        return html
+
+    @staticmethod
+    def _render_component(component: Dict[str, Any]) -> str:
+        try:
+            component_type = component.get("type")
+            props = component.get("props", {})
+            if not component_type:
+                raise ValueError("Component missing 'type' field")
+
+            id_attr = f' id="{props.get("id", "")}"' if props.get("id") else ""
+            class_attr = f' class="{props.get("className", "")}"' if props.get("className") else ""
+            style_attr = f' style="{";".join([f"{k}:{v}" for k,v in props.get("style", {}).items()])}"' if props.get("style") else ""
+
+            if component_type == "input":
+                return f"""
+                    <div class="form-group">
+                        <label for="{props.get("id")}">{props.get("label", "")}</label>
+                        <input type="{props.get("type", "text")}"
+                               name="{props.get("name", "")}"
+                               placeholder="{props.get("placeholder", "")}"
+                               value="{props.get("value", "")}"
+                               {"required" if props.get("required") else ""}
+                               {id_attr}
+                               class="input{class_attr}"
+                               {style_attr}>
+                    </div>
+                """
+            elif component_type == "button":
+                return f"""
+                    <button{id_attr} 
+                            class="button{class_attr}"
+                            {"disabled" if props.get("disabled") else ""}
+                            {style_attr}>
+                        {props.get("text", "Button")}
+                    </button>
+                """
+            elif component_type == "image":
+                return f"""
+                    <img src="{props.get("src", "")}"
+                         alt="{props.get("alt", "")}"
+                         style="object-fit: {props.get("objectFit", "cover")}{style_attr}"
+                         {id_attr}
+                         class="image{class_attr}">
+                """
+            elif component_type == "heading":
+                level = props.get("level", 1)
+                return f"""
+                    <h{level}{id_attr} 
+                           class="heading{class_attr}"
+                           {style_attr}>
+                        {props.get("text", "")}
+                    </h{level}>
+                """
+            elif component_type == "text":
+                return f"""
+                    <p{id_attr} 
+                       class="text{class_attr}"
+                       {style_attr}>
+                        {props.get("text", "")}
+                    </p>
+                """
+            else:
+                raise ValueError(f"Unknown component type: {component_type}")
+        except Exception as e:
+            print(f"[Renderer] Error rendering component: {str(e)}")
+            print(f"[Renderer] Component data: {json.dumps(component, indent=2)}")
+            raise Exception(f"Failed to render component: {str(e)}")
+
+    @staticmethod
+    def _render_layout(layout: Dict[str, Any], content: str) -> str:
+        layout_type = layout.get("type", "flex")
+        props = layout.get("props", {})
+        style = ""
+        if layout_type == "flex":
+            style = f"""
+                    display: flex;
+                    flex-direction: {props.get("direction", "column")};
+                    gap: {props.get("spacing", "1rem")};
+                    align-items: {props.get("align", "center")};
+                    justify-content: {props.get("justify", "center")};
+                """
+        elif layout_type == "grid":
+            style = f"""
+                    display: grid;
+                    grid-template-columns: {props.get("columns", "1fr")};
+                    gap: {props.get("spacing", "1rem")};
+                    align-items: {props.get("align", "center")};
+                    justify-content: {props.get("justify", "center")};
+                """
+        return f"""
+                <div class="container" style="{style}">
+                    {content}
+                </div>
+            """
+
+def _edge_case_document() -> Dict[str, Any]:
+    """Components the renderer skips or renders with every optional attribute"""
+    document = corpus.ui_document(10)
+    document["ui_components"] = document["ui_components"] + [
+        {"props": {"text": "no type"}},
+        {"type": "carousel", "props": {}},
+        {"type": "text"},
+        {"type": "heading", "props": {"text": "Styled", "id": "h", "className": "big", "style": {"color": "red", "margin": "0"}}},
+        {"type": "input", "props": {"name": "q", "value": "x", "className": "wide"}},
+        {"type": "button", "props": {"disabled": True, "style": {}}},
+        {"type": "image", "props": {"style": {"width": "10px"}, "id": "img"}}
+    ]
+    document["layout"] = {"type": "flex", "props": {"direction": "row", "align": "start"}}
+    return document
+
+def _best_time(fn: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def check_identical() -> int:
+    """Number of documents where the compiled and legacy renderers differ"""
+    documents = [
+        ("corpus_10", corpus.ui_document(10)),
+        ("corpus_1000", corpus.ui_document(1000)),
+        ("edge_cases", _edge_case_document()),
+        ("empty", {}),
+        ("unknown_layout", {"ui_components": corpus.ui_document(5)["ui_components"], "layout": {"type": "stack"}})
+    ]
+    mismatches = 0
+    for name, document in documents:
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_html = LegacyHTMLRenderer.generate_html(document)
+        if HTMLRenderer.generate_html(document) != legacy_html:
+            print(f"MISMATCH generate_html/{name}")
+            mismatches += 1
+        # A small chunk size makes sure documents span several chunks
+        if "".join(HTMLRenderer.iter_html(document, chunk_size=1024)) != legacy_html:
+            print(f"MISMATCH iter_html/{name}")
+            mismatches += 1
+    print(f"Identical output on {len(documents) * 2 - mismatches}/{len(documents) * 2} renders")
+    return mismatches
+
+def _peak_allocation(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _stream(document: Dict[str, Any]) -> int:
+    """Consume iter_html the way a response does, one chunk at a time"""
+    size = 0
+    for chunk in HTMLRenderer.iter_html(document):
+        size += len(chunk)
+    return size
+
+def main() -> None:
+    mismatches = check_identical()
+
+    print(f"\n{'components':>10} {'legacy':>10} {'compiled':>10} {'speedup':>8} {'components/s':>14}")
+    for size in SIZES:
+        document = corpus.ui_document(size)
+        sink = io.StringIO()
+
+        def legacy() -> None:
+            # The legacy renderer prints its debug dumps; writing them to memory is part of its cost
+            with contextlib.redirect_stdout(sink):
+                LegacyHTMLRenderer.generate_html(document)
+            sink.seek(0)
+            sink.truncate()
+
+        legacy_time = _best_time(legacy)
+        compiled_time = _best_time(lambda: HTMLRenderer.generate_html(document))
+        print(
+            f"{size:>10} {legacy_time * 1e3:>8.2f}ms {compiled_time * 1e3:>8.2f}ms "
+            f"{legacy_time / compiled_time:>7.1f}x {size / compiled_time:>14,.0f}"
+        )
+
+    print(f"\n{'components':>10} {'page size':>10} {'generate_html peak':>19} {'iter_html peak':>15}")
+    for size in MEMORY_SIZES:
+        document = corpus.ui_document(size)
+        page_size = _stream(document)
+        built = _peak_allocation(lambda: HTMLRenderer.generate_html(document))
+        streamed = _peak_allocation(lambda: _stream(document))
+        print(f"{size:>10} {page_size / 1024:>7.0f}KiB {built / 1024:>16.0f}KiB {streamed / 1024:>12.0f}KiB")
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Re-renders UI documents with IncrementalRenderer after small edits.
+
+Checks, over a long run of random edits (property tweaks, inserts, removals, type
+and theme changes, broken components), that the re-rendered page matches
+HTMLRenderer.generate_html and that applying the DOM patches to the previous page
+gives the same DOM, and that the size a rendered page is counted at in the page
+cache is within SIZE_TOLERANCE of the memory it keeps. Then reports the latency of
+re-rendering after one property tweak against rendering the whole page, as the page
+grows. Run from the repository root:
+
+    python -m benchmarks.rerender_bench
+"""
+import copy
+import gc
+import json
+import random
+import time
+import tracemalloc
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.incremental_renderer import IncrementalRenderer
+from app.services.renderer import CONTAINER_TAGS, HTMLRenderer
+from benchmarks import corpus
+
+EDITS = 400
+SIZES = (1000, 10000, 50000)
+VOID_TAGS = {"input", "img", "meta", "link", "br", "hr"}
+# Allowed ratio between a page's counted size and the memory it keeps, either way
+SIZE_TOLERANCE = 1.5
+
+class _Element:
+    def __init__(self, tag: str, attributes: Dict[str, Optional[str]]):
+        self.tag = tag
+        self.attributes = attributes
+        self.children: List[Any] = []
+
+    def elements(self) -> List["_Element"]:
+        return [child for child in self.children if isinstance(child, _Element)]
+
+    def canonical(self) -> Tuple[Any, ...]:
+        children = tuple(child.canonical() if isinstance(child, _Element) else child for child in self.children)
+        return (self.tag, tuple(sorted(self.attributes.items())), children)
+
+class _TreeBuilder(HTMLParser):
+    """Just enough of a DOM to apply patches to: elements, attributes and text"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Element("#root", {})
+        self._open = [self.root]
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        element = _Element(tag, dict(attrs))
+        self._open[-1].children.append(element)
+        if tag not in VOID_TAGS:
+            self._open.append(element)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in VOID_TAGS:
+            self._open.pop()
+
+    def handle_data(self, data: str) -> None:
+        if data.strip():
+            self._open[-1].children.append(data.strip())
+
+def _parse(html: str) -> _Element:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+def _find(element: _Element, tag: str) -> _Element:
+    stack = [element]
+    while stack:
+        current = stack.pop()
+        if current.tag == tag:
+            return current
+        stack.extend(reversed(current.elements()))
+    raise LookupError(tag)
+
+def _apply(page_html: str, patches: List[Dict[str, Any]]) -> _Element:
+    """The DOM of page_html after applying patches, the way the preview would"""
+    document = _parse(page_html)
+    container = _find(document, "body").elements()[0]
+    for patch in patches:
+        if patch["op"] == "stylesheet":
+            head = _find(document, "head")
+            if "href" in patch:
+                _find(head, "link").attributes["href"] = patch["href"]
+            else:
+                _find(head, "style").children = [patch["css"].strip()]
+            continue
+
+        *parent_path, index = patch["path"] or [None]
+        parent = container
+        for step in parent_path:
+            parent = parent.elements()[step]
+        if patch["op"] == "set_attributes":
+            target = parent.elements()[index] if patch["path"] else container
+            for name, value in patch["attributes"].items():
+                if value is None:
+                    target.attributes.pop(name, None)
+                else:
+                    target.attributes[name] = value
+            continue
+
+        siblings = parent.elements()
+        position = parent.children.index(siblings[index]) if index < len(siblings) else len(parent.children)
+        if patch["op"] == "remove":
+            del parent.children[position]
+        elif patch["op"] == "replace":
+            parent.children[position:position + 1] = _parse(patch["html"]).children
+        elif patch["op"] == "insert":
+            parent.children[position:position] = _parse(patch["html"]).children
+    return document
+
+def _locations(document: Dict[str, Any]) -> List[Tuple[List[Any], int]]:
+    """(children list, index) of every component in the document"""
+    locations = []
+    stack = [document["ui_components"]]
+    while stack:
+        children = stack.pop()
+        for index, component in enumerate(children):
+            locations.append((children, index))
+            if isinstance(component, dict) and isinstance(component.get("children"), list):
+                stack.append(component["children"])
+    return locations
+
+def _edit(document: Dict[str, Any], rng: random.Random) -> str:
+    """Make one random edit to document in place and name it"""
+    locations = _locations(document)
+    children, index = rng.choice(locations) if locations else (document["ui_components"], 0)
+    component = children[index] if index < len(children) else None
+    kind = rng.choice([
+        "text", "text", "text", "insert", "insert", "remove", "container_props",
+        "retype", "break", "move", "theme", "layout"
+    ])
+    if kind == "text" and isinstance(component, dict) and isinstance(component.get("props"), dict):
+        component["props"]["text"] = f"Edited {rng.random():.6f}"
+    elif kind == "insert":
+        new = corpus._card(rng.randrange(5)) if rng.random() < 0.4 else {"type": "text", "props": {"text": f"New {rng.random():.6f}"}}
+        children.insert(rng.randrange(len(children) + 1), new)
+    elif kind == "remove" and component is not None:
+        del children[index]
+    elif kind == "container_props" and isinstance(component, dict) and component.get("type") in CONTAINER_TAGS:
+        component["props"] = {"className": rng.choice(["", "a", "b"]), "style": {"margin": f"{rng.randrange(4)}px"}}
+    elif kind == "retype" and component is not None:
+        children[index] = {"type": rng.choice(["form", "heading", "button"]), "props": {"text": "Retyped"}, "children": [{"type": "text", "props": {"text": "Inside"}}]}
+    elif kind == "break" and isinstance(component, dict):
+        component["type"] = "bogus" if component.get("type") != "bogus" else "text"
+    elif kind == "move" and component is not None:
+        moved = children.pop(index)
+        children.insert(rng.randrange(len(children) + 1), moved)
+    elif kind == "theme":
+        document["design_tokens"]["colors"]["primary"] = rng.choice(["#0066FF", "#FF0000", "#00AA00"])
+    elif kind == "layout":
+        document["layout"] = rng.choice([{"type": "flex"}, {"type": "grid", "props": {"columns": "1fr"}}, {"type": "stack"}])
+    else:
+        return "none"
+    return kind
+
+def check_patches(edits: int = EDITS, seed: int = 7) -> int:
+    """Number of edits after which the page or the patched DOM is wrong"""
+    rng = random.Random(seed)
+    failures = 0
+    for stylesheet_base in (None, "/api/styles/"):
+        document = corpus.nested_ui_document(6)
+        document["ui_components"] += corpus.wide_ui_document(40, distinct=3)["ui_components"]
+        page = IncrementalRenderer.render(copy.deepcopy(document), stylesheet_base)
+        for step in range(edits):
+            kind = _edit(document, rng)
+            update = IncrementalRenderer.rerender(page, copy.deepcopy(document))
+            expected = HTMLRenderer.generate_html(document, stylesheet_base)
+            if update.page.html != expected:
+                print(f"MISMATCH page after edit {step} ({kind})")
+                failures += 1
+            elif _apply(page.html, update.patches).canonical() != _parse(expected).canonical():
+                print(f"MISMATCH patches after edit {step} ({kind}): {update.patches}")
+                failures += 1
+            page = update.page
+    print(f"Page and patched DOM correct after {edits * 2 - failures}/{edits * 2} random edits")
+    return failures
+
+def check_sizes() -> int:
+    """Number of pages whose counted size is off from the memory they keep"""
+    documents = [
+        ("deep_50", corpus.nested_ui_document(50)),
+        ("wide_1000", corpus.wide_ui_document(1000, distinct=1000)),
+        ("flat_1000", corpus.ui_document(1000))
+    ]
+    failures = 0
+    print(f"\n{'document':<16} {'counted':>10} {'retained':>10} {'ratio':>6}")
+    for name, document in documents:
+        text = json.dumps(document)
+        gc.collect()
+        tracemalloc.start()
+        # Parsed from JSON, as the endpoint receives it, so no component dict is shared
+        page = IncrementalRenderer.render(json.loads(text))
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        ratio = page.size / retained
+        print(f"{name:<16} {page.size:>10} {retained:>10} {ratio:>6.2f}")
+        if not 1 / SIZE_TOLERANCE <= ratio <= SIZE_TOLERANCE:
+            failures += 1
+    return failures
+
+def _best_time(fn: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    failures = check_patches() + check_sizes()
+
+    print(f"\n{'document':<16} {'full render':>12} {'patches':>10} {'html':>10} {'rendered':>9} {'patch bytes':>12}")
+    documents = [("deep_50", corpus.nested_ui_document(50))]
+    documents += [(f"wide_{size}", corpus.wide_ui_document(size, distinct=size)) for size in SIZES]
+    for name, document in documents:
+        page = IncrementalRenderer.render(document)
+        # Tweak one property in the middle of the page
+        edited = copy.deepcopy(document)
+        children, index = _locations(edited)[len(_locations(edited)) // 2]
+        children[index].setdefault("props", {})["text"] = "Edited"
+
+        full = _best_time(lambda: HTMLRenderer.generate_html(edited))
+        patches = _best_time(lambda: IncrementalRenderer.rerender(page, edited))
+        html = _best_time(lambda: IncrementalRenderer.rerender(page, edited).page.html)
+        update = IncrementalRenderer.rerender(page, edited)
+        patch_bytes = sum(len(patch.get("html", "")) for patch in update.patches)
+        print(
+            f"{name:<16} {full * 1e3:>10.2f}ms {patches * 1e3:>8.2f}ms {html * 1e3:>8.2f}ms "
+            f"{update.rendered:>9} {patch_bytes:>12}"
+        )
+
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
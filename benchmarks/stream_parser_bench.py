@@ -0,0 +1,83 @@
+"""
+Stream-end latency of StreamingCodeParser against batch post-processing.
+
+Feeds each response to the parser in token-sized deltas, checks that the finished
+preview matches AIService._build_preview on the whole response, and reports the
+parser's total and worst per-delta cost next to the time left at stream end
+(finish() plus the template splice) and the batch time it replaces. Run from the
+repository root:
+
+    python -m benchmarks.stream_parser_bench
+"""
+import os
+import sys
+import time
+from typing import List
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from app.services.ai_service import AIService
+from app.services.stack_profiles import get_stack_profile
+from benchmarks import corpus
+
+# Roughly one streamed text delta
+DELTA_CHARS = 16
+
+def _deltas(text: str) -> List[str]:
+    return [text[i:i + DELTA_CHARS] for i in range(0, len(text), DELTA_CHARS)]
+
+def main() -> None:
+    responses = [
+        ("react", corpus.REACT_RESPONSE, "react-tailwind"),
+        ("html", corpus.HTML_RESPONSE, "html-tailwind"),
+        ("large_100kb", corpus.large_response(), "react-tailwind"),
+        ("unterminated", corpus.unterminated_response(), "react-tailwind"),
+        ("prose_heavy", corpus.prose_heavy_code(), "react-tailwind"),
+        ("effect_cleanup", corpus.REACT_EFFECT_RESPONSE, "react-tailwind"),
+        ("map_callback", corpus.REACT_MAP_RETURN_RESPONSE, "react-tailwind"),
+        ("helper_function", corpus.REACT_HELPER_RESPONSE, "react-tailwind"),
+        ("unclosed_comment", corpus.unclosed_comment_response(), "react-tailwind"),
+        ("escaped_string", corpus.escaped_string_response(), "react-tailwind")
+    ]
+
+    mismatches = 0
+    print(f"{'response':<16} {'deltas':>7} {'parse total':>12} {'worst delta':>12} {'stream end':>12} {'batch':>12}")
+    for name, response, tech_stack in responses:
+        deltas = _deltas(response)
+        profile = get_stack_profile(tech_stack)
+        best_total = best_worst = best_end = float("inf")
+        for _ in range(5):
+            parser = profile.create_stream_parser()
+            worst = 0.0
+            start = time.perf_counter()
+            for delta in deltas:
+                delta_start = time.perf_counter()
+                parser.feed(delta)
+                worst = max(worst, time.perf_counter() - delta_start)
+            end_start = time.perf_counter()
+            parser.finish()
+            preview_html = profile.splice(parser.preview_code())
+            now = time.perf_counter()
+            best_total = min(best_total, now - start)
+            best_worst = min(best_worst, worst)
+            best_end = min(best_end, now - end_start)
+
+        batch = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            expected_html, expected_code = AIService._build_preview(response, tech_stack)
+            batch = min(batch, time.perf_counter() - start)
+
+        if (preview_html, parser.code) != (expected_html, expected_code):
+            print(f"MISMATCH {name}")
+            mismatches += 1
+        print(
+            f"{name:<16} {len(deltas):>7} {best_total * 1e3:>10.2f}ms {best_worst * 1e6:>10.1f}us "
+            f"{best_end * 1e6:>10.1f}us {batch * 1e6:>10.1f}us"
+        )
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Renders nested component trees with HTMLRenderer.
+
+Checks that the iterative renderer produces the same pages as a straightforward
+recursive one, that trees far deeper than the recursion limit still render, and
+reports render time against the recursive renderer on a tree 50 levels deep and on
+trees 10k nodes wide with a varying number of distinct cards. Run from the
+repository root:
+
+    python -m benchmarks.tree_bench
+"""
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from app.services import renderer
+from app.services.renderer import HTMLRenderer, SubtreeRenderer
+from benchmarks import corpus
+
+DEEP_LEVELS = 50
+WIDE_NODES = 10000
+WIDE_DISTINCT = (10, 100, 1000, 2500)
+
+def _recursive_html(node: Any) -> str:
+    """The reference: render a component and its children by recursion, without reuse"""
+    if not renderer._is_container(node):
+        try:
+            return HTMLRenderer._render_component(node)
+        except Exception:
+            return ""
+    try:
+        open_tag = renderer._container_open(node["type"], renderer._container_attributes(node["type"], node.get("props", {})))
+    except Exception:
+        return ""
+    children = "".join(_recursive_html(child) for child in renderer._children(node))
+    return open_tag + children + renderer._container_close(node["type"])
+
+def _render(document: Dict[str, Any], reuse: bool) -> str:
+    subtrees = SubtreeRenderer() if reuse else SubtreeRenderer(max_entries=0)
+    return "".join("".join(subtrees.render(component)) for component in document["ui_components"])
+
+def _best_time(fn: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def check_identical() -> int:
+    """Number of documents where the iterative and recursive renderers differ"""
+    broken = corpus.wide_ui_document(100, distinct=5)
+    broken["ui_components"][1]["children"] += [
+        {"type": "carousel", "children": []},
+        {"type": "card", "props": "not a dict", "children": [{"type": "text"}]},
+        {"type": "form", "children": "not a list"},
+        {"type": "card", "props": {"style": {"margin": "0"}}, "children": [{"type": "heading", "props": {"level": True}}]},
+        {"type": "card", "props": {"style": {"margin": "0"}}, "children": [{"type": "heading", "props": {"level": 1}}]},
+        "not a component"
+    ]
+    documents = [
+        ("deep_50", corpus.nested_ui_document(DEEP_LEVELS)),
+        ("wide_10k", corpus.wide_ui_document(WIDE_NODES)),
+        ("broken", broken)
+    ]
+    mismatches = 0
+    for name, document in documents:
+        expected = "".join(_recursive_html(component) for component in document["ui_components"])
+        for reuse in (True, False):
+            if _render(document, reuse) != expected:
+                print(f"MISMATCH {name} reuse={reuse}")
+                mismatches += 1
+
+    # The reference would hit the recursion limit long before this depth
+    depth = sys.getrecursionlimit() * 5
+    HTMLRenderer.generate_html(corpus.nested_ui_document(depth))
+    print(f"Identical output on {len(documents) * 2 - mismatches}/{len(documents) * 2} renders; {depth} levels deep rendered")
+    return mismatches
+
+def main() -> None:
+    mismatches = check_identical()
+
+    print(f"\n{'document':<28} {'nodes':>6} {'recursive':>10} {'iterative':>10} {'speedup':>8} {'rendered':>9}")
+    documents = [(f"deep_{DEEP_LEVELS}", corpus.nested_ui_document(DEEP_LEVELS))]
+    documents += [(f"wide_10k/{distinct}_distinct", corpus.wide_ui_document(WIDE_NODES, distinct)) for distinct in WIDE_DISTINCT]
+    for name, document in documents:
+        subtrees = SubtreeRenderer()
+        for component in document["ui_components"]:
+            "".join(subtrees.render(component))
+        stats = subtrees.stats()
+        nodes = stats["rendered"] + stats["reused"]
+
+        plain = _best_time(lambda: [_recursive_html(component) for component in document["ui_components"]])
+        reused = _best_time(lambda: _render(document, reuse=True))
+        print(
+            f"{name:<28} {nodes:>6} {plain * 1e3:>8.2f}ms {reused * 1e3:>8.2f}ms "
+            f"{plain / reused:>7.1f}x {stats['rendered']:>9}"
+        )
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
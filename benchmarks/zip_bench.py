@@ -0,0 +1,113 @@
+"""
+Per-download cost of building the React project archive.
+
+Compares the original tempdir-and-zip-from-disk approach, an in-memory archive that
+recompresses every file, and the prebuilt skeleton that only appends the generated
+sources. All three archive the same generated files, split once up front, so only
+the archive building is timed. CPU time comes from time.process_time(); read/write
+syscall counts come from /proc/self/io (Linux only). Run from the repository root:
+
+    python -m benchmarks.zip_bench --iterations 500
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from app.services.file_service import FileService, REACT_SKELETON_ENTRIES, REACT_SKELETON_ZIP
+
+SAMPLE_CONTENT = """interface Item {
+  id: number;
+  name: string;
+  price: number;
+}
+
+const ItemCard = ({ item }: { item: Item }) => {
+  return (
+    <div className="p-4 rounded shadow">{item.name} - ${item.price}</div>
+  );
+});
+
+const App = () => {
+  const [items, setItems] = useState<Item[]>([]);
+  return (
+    <div className="min-h-screen">{items.map(item => <ItemCard key={item.id} item={item} />)}</div>
+  );
+});
+""" * 4
+
+# The generated files every variant archives
+GENERATED_ENTRIES = [
+    ("src/types/interfaces.ts", SAMPLE_CONTENT),
+    ("src/components/Components.tsx", SAMPLE_CONTENT),
+    ("src/App.tsx", SAMPLE_CONTENT)
+]
+
+def legacy_tempdir_project(generated: list) -> bytes:
+    """The original implementation: write every file to a temp dir, then zip from disk"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        project_dir = os.path.join(temp_dir, "project")
+        os.makedirs(os.path.join(project_dir, "src", "components"))
+        os.makedirs(os.path.join(project_dir, "src", "types"))
+        entries = list(REACT_SKELETON_ENTRIES) + generated
+        for path, file_content in entries:
+            with open(os.path.join(project_dir, path), "w") as f:
+                f.write(file_content)
+        zip_path = os.path.join(temp_dir, "project.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for root, _, files in os.walk(project_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    zipf.write(file_path, os.path.relpath(file_path, project_dir))
+        with open(zip_path, "rb") as f:
+            return f.read()
+    finally:
+        shutil.rmtree(temp_dir)
+
+def in_memory_full_project(generated: list) -> bytes:
+    """In-memory archive that still recompresses the constant skeleton every time"""
+    return FileService._build_zip(list(REACT_SKELETON_ENTRIES) + generated)
+
+def prebuilt_skeleton_project(generated: list) -> bytes:
+    """What create_react_project does once the code is split"""
+    return FileService._append_to_zip(REACT_SKELETON_ZIP, generated)
+
+def _io_counters() -> dict:
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+def measure(name: str, fn, iterations: int) -> None:
+    fn(GENERATED_ENTRIES)
+    io_before = _io_counters()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        fn(GENERATED_ENTRIES)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    io_after = _io_counters()
+
+    syscalls = ""
+    if io_before and io_after:
+        reads = (io_after["syscr"] - io_before["syscr"]) / iterations
+        writes = (io_after["syscw"] - io_before["syscw"]) / iterations
+        syscalls = f"  read syscalls={reads:>6.1f}  write syscalls={writes:>6.1f}"
+    print(f"{name:<22} cpu={cpu / iterations * 1e6:>8.1f}us  wall={wall / iterations * 1e6:>8.1f}us{syscalls}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    measure("legacy tempdir", legacy_tempdir_project, args.iterations)
+    measure("in-memory full", in_memory_full_project, args.iterations)
+    measure("prebuilt skeleton", prebuilt_skeleton_project, args.iterations)
+
+if __name__ == "__main__":
+    main()